@@ -1,5 +1,6 @@
+import logging
 import os
-from supabase import create_client, Client
+import threading
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -9,8 +10,93 @@ load_dotenv()
 url: str = os.environ.get("SUPABASE_URL")
 key: str = os.environ.get("SUPABASE_KEY")
 
-# Create Supabase client
-supabase: Client = create_client(url, key)
+# "supabase" (default) or "local" for the in-process SQLite stand-in
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "supabase")
+
+
+def create_storage_client():
+    """Client for the configured storage backend; both expose the supabase-py query API."""
+    if STORAGE_BACKEND == "local":
+        from app.utils.local_backend import LocalClient
+        return LocalClient(os.environ.get("LOCAL_DB_PATH", ":memory:"))
+
+    from supabase import create_client
+    return create_client(url, key)
+
+
+class LazyClient:
+    """
+    Stand-in that builds the real client on first use (supabase-py and its
+    HTTP stack take a noticeable share of cold start). Attribute access is
+    forwarded, so `supabase.table(...)` / `supabase.storage` work unchanged.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    def connect(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self.connect(), name)
+
+
+# Supabase client, created on first query
+supabase = LazyClient(create_storage_client)
+
+logger = logging.getLogger(__name__)
+
+# PostgREST/Postgres codes for an upsert whose reading_id migration is missing:
+# no unique index to conflict on, or no such column
+MISSING_UNIQUE = "42P10"
+MISSING_COLUMN = {"42703", "PGRST204"}
+_not_migrated = {}   # table -> error code, once an upsert has failed that way
+
+
+def insert_once(table: str, rows: list) -> list:
+    """
+    Insert rows, skipping those whose reading_id is already stored (the
+    unique index from migrations/ makes retries on any worker safe). Rows
+    without a reading_id are inserted as they are. Until the migration is
+    applied, falls back to a plain insert. Returns the rows actually inserted.
+    """
+    keyed = [r for r in rows if r.get("reading_id") is not None]
+    plain = [r for r in rows if r.get("reading_id") is None]
+    inserted = []
+    if keyed and table not in _not_migrated:
+        try:
+            res = supabase.table(table).upsert(keyed, on_conflict="reading_id", ignore_duplicates=True).execute()
+            inserted += res.data or []
+            keyed = []
+        except Exception as e:
+            code = getattr(e, "code", None)
+            if code != MISSING_UNIQUE and code not in MISSING_COLUMN:
+                raise
+            _not_migrated[table] = code
+            logger.warning("%s.reading_id is not unique yet (%s); apply migrations/ to deduplicate retries", table, code)
+    if keyed and _not_migrated.get(table) in MISSING_COLUMN:
+        keyed = [{k: v for k, v in r.items() if k != "reading_id"} for r in keyed]
+    if keyed or plain:
+        res = supabase.table(table).insert(keyed + plain).execute()
+        inserted += res.data or []
+    return inserted
 
 
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+
+# "telegram" (default) or "fake" for the in-process Bot API stand-in
+TELEGRAM_BACKEND = os.getenv("TELEGRAM_BACKEND", "telegram")
+
+
+def telegram_transport():
+    """httpx transport for Bot API calls: None (real network) or the fake Bot API."""
+    if TELEGRAM_BACKEND == "fake":
+        from app.utils.fake_telegram import fake_telegram
+        return fake_telegram.transport()
+    return None
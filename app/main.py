@@ -1,8 +1,74 @@
+import asyncio
+import logging
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import predict_routes, train_routes, data_routes, getdata_routes, picron_routes, telegram_routes, telegram_notify_routes, shell_routes, livesensor_routes   
+from fastapi.middleware.gzip import GZipMiddleware
+from app.routers import predict_routes, train_routes, data_routes, getdata_routes, picron_routes, telegram_routes, telegram_notify_routes, shell_routes, livesensor_routes, logging_routes
+from app.utils.telegram_dispatcher import dispatcher
+from app.utils.subscriptions import subscriptions
+from app.utils.telegram_updates import consumer
+from app.utils.notification_digest import digests
+from app.utils.notification_outbox import outbox
+from app.utils.model_cache import model_cache
+from app.utils.inference_pool import inference_pool
+from app.utils.predict_batcher import batcher
+from app.utils.idempotency import idempotency
+from app.utils.result_cache import result_cache
+from app.utils import single_flight
+from app.utils import admission
+from app.utils.admission import AdmissionMiddleware
+from app.utils.metrics import metrics, MetricsMiddleware, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from app.utils.logging_setup import setup_logging, shutdown_logging, RequestLoggingMiddleware
+from app.database import TELEGRAM_BOT_TOKEN
 
+logger = logging.getLogger(__name__)
+
+
+async def _preload_subscriptions():
+    try:
+        await run_in_threadpool(subscriptions.load)
+    except Exception as e:
+        # chat lookups fall back to loading on first use
+        logger.warning("Could not preload Telegram subscriptions: %s", e)
+
+
+# Startup / shutdown. Everything with side effects (directories, threads,
+# network clients) starts here rather than at import time.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    setup_logging()
+    os.makedirs("app/models", exist_ok=True)
+    # in the background: /health should answer before Supabase is reached
+    preload = asyncio.create_task(_preload_subscriptions())
+    # the prefork launcher (app/server.py) warms models before forking;
+    # a plain `uvicorn app.main:app` warms them here and /ready waits for it
+    warmup = None if model_cache.ready else asyncio.create_task(run_in_threadpool(model_cache.warm))
+    # only one process may long-poll getUpdates: app/server.py starts it in worker 0 only,
+    # and the consumer's lease keeps unnumbered workers (uvicorn --workers) to one poller
+    if TELEGRAM_BOT_TOKEN and os.getenv("TELEGRAM_UPDATES_CONSUMER", "1") == "1" \
+            and os.getenv("WORKER_INDEX", "0") == "0":
+        consumer.start()
+    outbox.start()
+    inference_pool.start()
+    logger.info("PhotonTroppers API started successfully")
+
+    yield
+
+    # Graceful shutdown
+    await preload
+    if warmup is not None:
+        await warmup
+    inference_pool.stop()
+    consumer.stop()
+    digests.flush_all()
+    outbox.stop()
+    dispatcher.close()
+    logger.info("PhotonTroppers API shutting down")
+    shutdown_logging()
 
 
 # Create FastAPI app with production settings
@@ -12,8 +78,18 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
+# gzip for large bodies when the client accepts it (responses that already
+# carry a Content-Encoding, like the pre-gzipped /shell artifacts, pass through)
+app.add_middleware(GZipMiddleware, minimum_size=int(os.getenv("GZIP_MIN_SIZE", "1024")),
+                   compresslevel=int(os.getenv("GZIP_LEVEL", "5")))
+
+# Concurrency limits / bounded queues for /predict and /train (innermost, so
+# 503 rejections still get CORS headers, metrics and an access log line)
+app.add_middleware(AdmissionMiddleware)
+
 # CORS middleware for web frontend access
 app.add_middleware(
     CORSMiddleware,
@@ -23,6 +99,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency / in-flight metrics, exposed at /metrics
+app.add_middleware(MetricsMiddleware)
+# Request id / factory id on every log record, sampled access log (outermost)
+app.add_middleware(RequestLoggingMiddleware)
+metrics.add_collector("telegram_dispatcher", dispatcher.stats)
+metrics.add_collector("notification_outbox", outbox.stats)
+metrics.add_collector("model_cache", model_cache.stats)
+metrics.add_collector("inference_pool", inference_pool.stats)
+metrics.add_collector("predict_batcher", batcher.stats)
+metrics.add_collector("admission", admission.stats)
+metrics.add_collector("idempotency", idempotency.stats)
+metrics.add_collector("result_cache", result_cache.stats)
+metrics.add_collector("single_flight", single_flight.stats)
+
 # Health check endpoint for Render
 @app.get("/")
 async def root():
@@ -36,6 +126,18 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+# Readiness: 503 until the models are loaded and warmed (and inference workers are up)
+@app.get("/ready")
+async def ready_check():
+    if not (model_cache.ready and inference_pool.ready):
+        return JSONResponse({"status": "warming"}, status_code=503)
+    return {"status": "ready", "models": model_cache.warmed, "warm_seconds": model_cache.warm_seconds}
+
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return Response(metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
 # Include routers
 app.include_router(predict_routes.router, prefix="/predict", tags=["Predict"])
 app.include_router(train_routes.router, prefix="/train", tags=["Train"])
@@ -46,16 +148,4 @@ app.include_router(telegram_routes.router, prefix="/telegram", tags=["Telegram"]
 app.include_router(telegram_notify_routes.router, tags=["TelegramNotify"])
 app.include_router(shell_routes.router, prefix="/shell", tags=["Shell"])
 app.include_router(livesensor_routes.router, prefix="/livesensor", tags=["Live Sensor"])
-
-
-
-# Create models directory on startup
-@app.on_event("startup")
-async def startup_event():
-    os.makedirs("app/models", exist_ok=True)
-    print("PhotonTroppers API started successfully")
-
-# Graceful shutdown
-@app.on_event("shutdown")
-async def shutdown_event():
-    print("PhotonTroppers API shutting down") 
\ No newline at end of file
+app.include_router(logging_routes.router, prefix="/logging", tags=["Logging"])
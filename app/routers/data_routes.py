@@ -1,25 +1,88 @@
-from fastapi import APIRouter, HTTPException
-from app.database import supabase
+from fastapi import APIRouter, HTTPException, Request
+from typing import List
+import logging
+from app.database import insert_once
 from app.schemas import SensorData
+from app.utils.single_flight import flight
+from app.utils.idempotency import idempotency, request_key, replay_response, NEW
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Max readings accepted per bulk request
+BULK_LIMIT = 500
+
+
+def _to_row(data: SensorData) -> dict:
+    # Convert the Pydantic model to dict and handle datetime serialization
+    # Try Pydantic v2 method first, fallback to v1
+    try:
+        payload = data.model_dump()
+    except AttributeError:
+        payload = data.dict()
+
+    # Convert datetime to ISO string format for Supabase
+    if 'timestamp' in payload:
+        payload['timestamp'] = payload['timestamp'].isoformat()
+
+    # Only send reading_id when the client provided one
+    if payload.get('reading_id') is None:
+        payload.pop('reading_id', None)
+
+    # Device timings are not a sensor_data column
+    acquisition = payload.pop('acquisition', None)
+    if acquisition:
+        logger.debug("Acquisition timing", extra={"acquisition": acquisition})
+    return payload
+
 
 @router.post("/")
-def insert_data(data: SensorData):
+def insert_data(data: SensorData, request: Request):
+    # retries (Idempotency-Key header or reading_id) get the first response back
+    key = request_key(request, data.reading_id)
+    if key is not None:
+        outcome, stored = idempotency.begin("data", key)
+        if outcome != NEW:
+            return replay_response(outcome, stored)
     try:
-        # Convert the Pydantic model to dict and handle datetime serialization
-        # Try Pydantic v2 method first, fallback to v1
-        try:
-            payload = data.model_dump()
-        except AttributeError:
-            payload = data.dict()
-        
-        # Convert datetime to ISO string format for Supabase
-        if 'timestamp' in payload:
-            payload['timestamp'] = payload['timestamp'].isoformat()
-        
-        res = supabase.table("sensor_data").insert(payload).execute()
-        return {"status": "success", "data": res.data}
+        # a retried reading that is already stored is skipped, not duplicated
+        inserted = insert_once("sensor_data", [_to_row(data)])
+        flight("getdata").forget(data.factory_medicine_id)
+        response = {"status": "success", "data": inserted}
+        if key is not None:
+            idempotency.complete("data", key, response)
+        return response
     
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    finally:
+        if key is not None:
+            idempotency.release("data", key)
+
+
+@router.post("/bulk")
+def insert_data_bulk(readings: List[SensorData]):
+    """
+    Insert a batch of readings (offline queue flush from the Picron agent).
+
+    Every reading must carry a reading_id; readings already stored are
+    skipped (sensor_data.reading_id is unique), so re-sending a batch after a
+    lost response is safe.
+    """
+    if len(readings) > BULK_LIMIT:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_LIMIT} readings per request")
+    if any(r.reading_id is None for r in readings):
+        raise HTTPException(status_code=422, detail="Every reading needs a reading_id for bulk upload")
+
+    try:
+        rows = list({row["reading_id"]: row for row in map(_to_row, readings)}.values())
+        if not rows:
+            return {"status": "success", "received": 0, "inserted": 0}
+        inserted = len(insert_once("sensor_data", rows))
+        for factory_medicine_id in {row["factory_medicine_id"] for row in rows}:
+            flight("getdata").forget(factory_medicine_id)
+        logger.info("Bulk insert: %d/%d new readings", inserted, len(readings))
+        return {"status": "success", "received": len(readings), "inserted": inserted}
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -1,34 +1,46 @@
 # app/routers/getdata_routes.py
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
+import logging
 from app.database import supabase
+from app.utils.single_flight import flight
+from app.utils.fast_json import FastJSONResponse, check_format, shape
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+def _load_sensor_data(factory_medicine_id: str):
+    res = supabase.table("sensor_data") \
+                  .select("*") \
+                  .eq("factory_medicine_id", factory_medicine_id) \
+                  .order("timestamp", desc=True) \
+                  .execute()
+    return res.data
+
 
 @router.get("/{factory_medicine_id}")
-def get_sensor_data(factory_medicine_id: str):
+def get_sensor_data(factory_medicine_id: str, fmt: str = Query("rows", alias="format")):
+    """All sensor_data rows of a factory, newest first (`?format=columnar` for column lists)."""
+    check_format(fmt)
     try:
-        print(f"🔹 Fetching sensor_data for {factory_medicine_id}...")
+        logger.debug("Fetching sensor_data for %s", factory_medicine_id)
 
-        res = supabase.table("sensor_data") \
-                      .select("*") \
-                      .eq("factory_medicine_id", factory_medicine_id) \
-                      .order("timestamp", desc=True) \
-                      .execute()
+        # concurrent requests for the same factory share one query
+        data = flight("getdata").do(factory_medicine_id, lambda: _load_sensor_data(factory_medicine_id))
 
-        if not res.data:
+        if not data:
             return {
                 "status": "success",
                 "message": f"No data found for {factory_medicine_id}",
                 "data": []
             }
 
-        print(f"✅ Retrieved {len(res.data)} rows.")
-        return {
+        logger.debug("Retrieved %d rows", len(data))
+        return FastJSONResponse({
             "status": "success",
-            "count": len(res.data),
-            "data": res.data
-        }
+            "count": len(data),
+            "data": shape(data, fmt)
+        })
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -0,0 +1,40 @@
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from typing import Dict, Optional
+from app.utils.logging_setup import get_levels, set_level, sampler
+
+router = APIRouter()
+
+
+class LoggingConfig(BaseModel):
+    level: Optional[str] = None
+    logger: str = "app"
+    # access-log sample rate per "METHOD /route/{template}", 0..1
+    sample: Optional[Dict[str, float]] = None
+
+
+def _current() -> dict:
+    return {"levels": get_levels(), "sample": sampler.rates}
+
+
+@router.get("/")
+def get_logging():
+    """Current log levels and access-log sample rates."""
+    return {"status": "success", "data": _current()}
+
+
+@router.put("/")
+def update_logging(config: LoggingConfig):
+    """
+    Change log levels / sample rates without a restart, e.g.
+    {"level": "DEBUG", "logger": "app.routers.predict_routes"} or
+    {"sample": {"GET /picron/{factory_medicine_id}": 0.1}}.
+    """
+    try:
+        if config.level:
+            set_level(config.level, config.logger)
+        for route, rate in (config.sample or {}).items():
+            sampler.set_rate(route, rate)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    return {"status": "success", "data": _current()}
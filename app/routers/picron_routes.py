@@ -1,9 +1,12 @@
 # app/routers/picron_routes.py
 from fastapi import APIRouter, HTTPException
+import logging
 from app.database import supabase
 from app.schemas import PicronData
+from app.utils.single_flight import flight
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 # POST → Upsert Picron Data
 @router.post("/{factory_medicine_id}")
@@ -12,35 +15,42 @@ def upsert_picron(factory_medicine_id: str, data: PicronData):
         payload = data.dict()
         payload["factory_medicine_id"] = factory_medicine_id
 
-        print(f"🔹 Upserting picron data for {factory_medicine_id}...")
+        logger.debug("Upserting picron data for %s", factory_medicine_id)
 
         res = supabase.table("picron_data")\
                       .upsert(payload, on_conflict="factory_medicine_id")\
                       .execute()
 
-        print("✅ Upserted into picron_data")
+        flight("picron").forget(factory_medicine_id)
+        logger.debug("Upserted into picron_data")
         return {"status": "success", "data": res.data}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
+def _load_picron(factory_medicine_id: str):
+    res = supabase.table("picron_data")\
+                  .select("*")\
+                  .eq("factory_medicine_id", factory_medicine_id)\
+                  .execute()
+    return res.data
+
+
 # GET → Fetch Picron Data
 @router.get("/{factory_medicine_id}")
 def get_picron(factory_medicine_id: str):
     try:
-        print(f"🔹 Fetching picron data for {factory_medicine_id}...")
+        logger.debug("Fetching picron data for %s", factory_medicine_id)
 
-        res = supabase.table("picron_data")\
-                      .select("*")\
-                      .eq("factory_medicine_id", factory_medicine_id)\
-                      .execute()
+        # devices and dashboards polling the same factory share one query
+        data = flight("picron").do(factory_medicine_id, lambda: _load_picron(factory_medicine_id))
 
-        if not res.data:
+        if not data:
             raise HTTPException(status_code=404, detail="No data found for this factory_medicine_id")
 
-        print("✅ Retrieved picron_data")
-        return {"status": "success", "data": res.data}
+        logger.debug("Retrieved picron_data")
+        return {"status": "success", "data": data}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -1,28 +1,51 @@
 # app/routers/predict_routes.py
 
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, ValidationError
 from datetime import datetime
-import pickle
-import numpy as np
+from email.utils import format_datetime
+from typing import Dict, List, Optional
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
 import os
-import requests
 
-from app.database import supabase   # your supabase client
+from app.database import supabase, insert_once   # your supabase client
+from app.utils.subscriptions import subscriptions
+from app.utils.notification_digest import digests
+from app.utils.http_cache import not_modified
+from app.utils.model_export import export_models
+from app.utils.metrics import metrics, span
+from app.utils.predict_batcher import batcher
+from app.utils.result_cache import result_cache
+from app.utils.single_flight import flight
+from app.utils.fast_json import FastJSONResponse, check_format, shape
+from app.utils.idempotency import idempotency, request_key, replay_response, NEW
+from app.utils.model_cache import model_cache, model_version
+from app.utils.recent_predictions import recent_predictions, parse_timestamp, authoritative, CACHE_SIZE
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
-MODELS_DIR = "app/models"
+# Max rows per delta page; `has_more` / `next_after_id` continue from there
+DELTA_LIMIT = 500
 
-# 🔹 Your Telegram Bot Token
-TELEGRAM_BOT_TOKEN = "8347556033:AAFfDhKFNGBOk7qag0zdi9Jfj5y2sm54THI"
-TELEGRAM_API_URL = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
+# WebSocket sessions: shared device token (optional) and batched persistence
+PREDICT_WS_TOKEN = os.getenv("PREDICT_WS_TOKEN")
+WS_AUTH_TIMEOUT = 10  # seconds to send the auth message after connecting
+WS_PERSIST_BATCH = int(os.getenv("PREDICT_WS_PERSIST_BATCH", "20"))
+WS_PERSIST_INTERVAL = float(os.getenv("PREDICT_WS_PERSIST_INTERVAL", "2"))
 
 
 # ======================
 # Schema for input
 # ======================
 class SensorInput(BaseModel):
+    # Client-generated id; a retried reading is answered from the idempotency store
+    reading_id: Optional[str] = None
     temperature: float
     mq3_ppm: float
     as7263_r: float
@@ -31,70 +54,27 @@ class SensorInput(BaseModel):
     as7263_u: float
     as7263_v: float
     as7263_w: float
+    # Per-phase device timings (settle_ms, acquire_ms, readings, ...); logged only
+    acquisition: Optional[Dict[str, float]] = None
 
 
 # ======================
 # Helpers
 # ======================
 def load_models(factory_medicine_id: str):
-    """Load scaler and models from local MODELS_DIR. Raises FileNotFoundError if missing."""
-    paths = {
-        "scaler": os.path.join(MODELS_DIR, f"{factory_medicine_id}_scaler.pkl"),
-        "taste": os.path.join(MODELS_DIR, f"{factory_medicine_id}_taste.pkl"),
-        "quality": os.path.join(MODELS_DIR, f"{factory_medicine_id}_quality.pkl"),
-        "dilution": os.path.join(MODELS_DIR, f"{factory_medicine_id}_dilution.pkl"),
-    }
-
-    models = {}
-    for key, p in paths.items():
-        if not os.path.exists(p):
-            raise FileNotFoundError(f"Model file not found: {p}. Please run /train/{factory_medicine_id} first.")
-        with open(p, "rb") as f:
-            models[key] = pickle.load(f)
-    return models
+    """Scaler and models for a factory, from the in-process cache (re-read after /train)."""
+    return model_cache.get(factory_medicine_id)
 
 
 def send_telegram(factory_medicine_id: str, message: dict):
-    """Send prediction message to all Telegram chat_ids for this factory."""
+    """Notify this factory's Telegram chats (coalesced into per-factory digests)."""
     try:
-        # 1) Fetch chat_ids from Supabase
-        res = supabase.table("telegram_factory_map") \
-            .select("chat_id") \
-            .eq("factory_medicine_id", factory_medicine_id) \
-            .execute()
-
-        chat_ids = [row["chat_id"] for row in res.data]
-        if not chat_ids:
-            print(f"⚠️ No chat_ids found for {factory_medicine_id}")
+        if not subscriptions.chat_ids(factory_medicine_id):
+            logger.debug("No chat_ids found for %s", factory_medicine_id)
             return
-
-        # 2) Format message nicely
-        text_message = (
-            f"📢 *Prediction Update* for `{factory_medicine_id}`\n\n"
-            f"🍬 Sweet: {message['taste']['sweet']}\n"
-            f"🧂 Salty: {message['taste']['salty']}\n"
-            f"🍋 Sour: {message['taste']['sour']}\n"
-            f"☕ Bitter: {message['taste']['bitter']}\n"
-            f"🍄 Umami: {message['taste']['umami']}\n\n"
-            f"✨ Quality: {message['quality']}\n"
-            f"💧 Dilution: {message['dilution']}"
-        )
-
-        # 3) Send to all chat_ids
-        for chat_id in chat_ids:
-            payload = {
-                "chat_id": chat_id,
-                "text": text_message,
-                "parse_mode": "Markdown"
-            }
-            r = requests.post(TELEGRAM_API_URL, json=payload)
-            if r.status_code != 200:
-                print(f"⚠️ Failed to send to {chat_id}: {r.text}")
-
-        print(f"✅ Sent Telegram notifications to {chat_ids}")
-
+        digests.add(factory_medicine_id, message)
     except Exception as e:
-        print(f"⚠️ Telegram error: {e}")
+        logger.warning("Telegram error: %s", e)
 
 
 # ======================
@@ -102,109 +82,450 @@ def send_telegram(factory_medicine_id: str, message: dict):
 # ======================
 
 # POST → Predict and insert into DB + Telegram notify
+def _input_row(data: SensorInput) -> list:
+    return [data.temperature, data.mq3_ppm, data.as7263_r, data.as7263_s,
+            data.as7263_t, data.as7263_u, data.as7263_v, data.as7263_w]
+
+
+async def _infer(factory_medicine_id: str, data: SensorInput) -> dict:
+    """
+    Load models, scale and predict in the inference pool (stacked with
+    concurrent requests when batching is on), or answer a repeat reading
+    from the result cache when it is enabled.
+    """
+    row = _input_row(data)
+    if result_cache.enabled:
+        cached = result_cache.get(factory_medicine_id, model_version(factory_medicine_id), row)
+        if cached is not None:
+            return cached
+
+    with span("predict.inference"):
+        result = await batcher.predict(factory_medicine_id, row)
+    for stage, seconds in result["timings"].items():
+        metrics.observe("span_duration_seconds", seconds, span=f"predict.{stage}")
+
+    if result_cache.enabled:
+        result_cache.put(factory_medicine_id, result["model_version"], row, result)
+    return result
+
+
+def _prediction_row(factory_medicine_id: str, data: SensorInput, taste_pred: list,
+                    quality_val: float, dilution_val: float, version: str) -> dict:
+    row = {
+        "factory_medicine_id": factory_medicine_id,
+        "timestamp": datetime.utcnow().isoformat(),
+        "temperature": float(data.temperature),
+        "mq3_ppm": float(data.mq3_ppm),
+        "as7263_r": float(data.as7263_r),
+        "as7263_s": float(data.as7263_s),
+        "as7263_t": float(data.as7263_t),
+        "as7263_u": float(data.as7263_u),
+        "as7263_v": float(data.as7263_v),
+        "as7263_w": float(data.as7263_w),
+        "taste_sweet": taste_pred[0],
+        "taste_salty": taste_pred[1],
+        "taste_bitter": taste_pred[2],
+        "taste_sour": taste_pred[3],
+        "taste_umami": taste_pred[4],
+        "quality": quality_val,
+        "dilution": dilution_val,
+        "model_version": version
+    }
+    # stored so a retry that reaches another worker is still skipped by the database
+    if data.reading_id is not None:
+        row["reading_id"] = data.reading_id
+    return row
+
+
+def _prediction_message(row: dict) -> dict:
+    """The prediction part of a stored row (Telegram message / API response)."""
+    return {
+        "taste": {
+            "sweet": row["taste_sweet"],
+            "salty": row["taste_salty"],
+            "bitter": row["taste_bitter"],
+            "sour": row["taste_sour"],
+            "umami": row["taste_umami"]
+        },
+        "quality": row["quality"],
+        "dilution": row["dilution"]
+    }
+
+
+def _store_predictions(factory_medicine_id: str, rows: list) -> list:
+    """
+    Insert prediction rows and notify Telegram (blocking I/O, runs in the
+    threadpool). Rows whose reading_id is already stored are skipped and not
+    notified again. Returns the inserted rows.
+    """
+    # 5) Insert into Supabase
+    with span("predict.insert"):
+        inserted = insert_once("predicted_data", rows)
+    for stored in inserted:
+        recent_predictions.push(factory_medicine_id, stored)
+    flight("predictions").forget(factory_medicine_id)
+
+    # 6) Send Telegram Notification
+    stored_ids = {r.get("reading_id") for r in inserted}
+    with span("predict.send_telegram"):
+        for row in rows:
+            if row.get("reading_id") is None or row["reading_id"] in stored_ids:
+                send_telegram(factory_medicine_id, _prediction_message(row))
+    return inserted
+
+
 @router.post("/{factory_medicine_id}")
-def predict(factory_medicine_id: str, data: SensorInput):
+async def predict(factory_medicine_id: str, data: SensorInput, request: Request):
+    # retries (Idempotency-Key header or reading_id) get the first response back
+    # without running inference, the insert or the notification again
+    key = request_key(request, data.reading_id)
+    scope = f"predict:{factory_medicine_id}"
+    if key is not None:
+        outcome, stored = idempotency.begin(scope, key)
+        if outcome != NEW:
+            return replay_response(outcome, stored)
     try:
-        # 1) Load models
-        models = load_models(factory_medicine_id)
+        if data.acquisition:
+            logger.debug("Acquisition timing", extra={"acquisition": data.acquisition})
 
-        # 2) Prepare input and scale
-        X = np.array([[data.temperature, data.mq3_ppm, data.as7263_r, data.as7263_s,
-                       data.as7263_t, data.as7263_u, data.as7263_v, data.as7263_w]])
-        X_scaled = models["scaler"].transform(X)
-
-        # 3) Predict
-        taste_pred = models["taste"].predict(X_scaled).tolist()[0]
-        quality_pred = models["quality"].predict(X_scaled).tolist()[0]
-        dilution_pred = models["dilution"].predict(X_scaled).tolist()[0]
+        # 1-3) Load models, scale and predict
+        result = await _infer(factory_medicine_id, data)
 
         # normalize outputs
-        taste_pred = [float(x) for x in taste_pred]
-        quality_val = float(quality_pred[0]) if isinstance(quality_pred, (list, tuple, np.ndarray)) else float(quality_pred)
-        dilution_val = float(dilution_pred[0]) if isinstance(dilution_pred, (list, tuple, np.ndarray)) else float(dilution_pred)
-
-        # 4) Build DB row
-        timestamp = datetime.utcnow().isoformat()
-        row = {
-            "factory_medicine_id": factory_medicine_id,
-            "timestamp": timestamp,
-            "temperature": float(data.temperature),
-            "mq3_ppm": float(data.mq3_ppm),
-            "as7263_r": float(data.as7263_r),
-            "as7263_s": float(data.as7263_s),
-            "as7263_t": float(data.as7263_t),
-            "as7263_u": float(data.as7263_u),
-            "as7263_v": float(data.as7263_v),
-            "as7263_w": float(data.as7263_w),
-            "taste_sweet": taste_pred[0],
-            "taste_salty": taste_pred[1],
-            "taste_bitter": taste_pred[2],
-            "taste_sour": taste_pred[3],
-            "taste_umami": taste_pred[4],
-            "quality": quality_val,
-            "dilution": dilution_val,
-            "model_version": f"{factory_medicine_id}_v1"
-        }
+        taste_pred = [float(x) for x in result["taste"][0]]
+        quality_val = float(result["quality"][0])
+        dilution_val = float(result["dilution"][0])
 
-        # 5) Insert into Supabase
-        res = supabase.table("predicted_data").insert(row).execute()
-        if hasattr(res, "error") and res.error:
-            raise Exception(f"DB insert error: {res.error}")
-
-        # 6) Send Telegram Notification
-        send_telegram(factory_medicine_id, {
-            "taste": {
-                "sweet": taste_pred[0],
-                "salty": taste_pred[1],
-                "bitter": taste_pred[2],
-                "sour": taste_pred[3],
-                "umami": taste_pred[4]
-            },
-            "quality": quality_val,
-            "dilution": dilution_val
-        })
+        # 4-6) Build DB row, store and notify
+        row = _prediction_row(factory_medicine_id, data, taste_pred, quality_val, dilution_val, result["model_version"])
+        inserted = await run_in_threadpool(_store_predictions, factory_medicine_id, [row])
 
         # 7) Return predictions
-        return {
+        response = {
             "status": "success",
-            "prediction": {
-                "taste": {
-                    "sweet": taste_pred[0],
-                    "salty": taste_pred[1],
-                    "bitter": taste_pred[2],
-                    "sour": taste_pred[3],
-                    "umami": taste_pred[4]
-                },
-                "quality": quality_val,
-                "dilution": dilution_val
-            },
-            "db_response": res.data if hasattr(res, "data") else str(res)
+            "prediction": _prediction_message(row),
+            "db_response": inserted
         }
+        if key is not None:
+            idempotency.complete(scope, key, response)
+        return response
 
     except FileNotFoundError as fnf:
         raise HTTPException(status_code=404, detail=str(fnf))
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc))
+    finally:
+        if key is not None:
+            idempotency.release(scope, key)
+
+
+# WebSocket → Prediction session for continuously sampling devices
+class PredictSession:
+    """Prediction rows of one WebSocket session, stored in batches."""
+
+    def __init__(self, factory_medicine_id: str):
+        self.factory_medicine_id = factory_medicine_id
+        self.pending = []   # (seq, row)
+        self._lock = asyncio.Lock()
+
+    async def add(self, seq, row: dict):
+        self.pending.append((seq, row))
+        if len(self.pending) >= WS_PERSIST_BATCH:
+            return await self.flush()
+        return None
+
+    async def flush(self):
+        """Store pending rows; returns the last stored seq (None if nothing was stored)."""
+        async with self._lock:
+            if not self.pending:
+                return None
+            batch, self.pending = self.pending, []
+            try:
+                await run_in_threadpool(_store_predictions, self.factory_medicine_id, [row for _, row in batch])
+            except Exception as e:
+                logger.warning("Storing %d session predictions failed: %s", len(batch), e)
+                self.pending = batch + self.pending
+                return None
+            return batch[-1][0]
+
+
+async def _flush_periodically(websocket: WebSocket, session: PredictSession):
+    try:
+        while True:
+            await asyncio.sleep(WS_PERSIST_INTERVAL)
+            seq = await session.flush()
+            if seq is not None:
+                await websocket.send_json({"type": "persisted", "seq": seq})
+    except Exception:
+        pass  # session closed; the handler does the final flush
+
+
+@router.websocket("/ws/{factory_medicine_id}")
+async def predict_session(websocket: WebSocket, factory_medicine_id: str):
+    """
+    Streaming predictions over one connection.
+
+    - client `{"type": "auth", "token": ...}` → server `{"type": "ready", "model_version": ...}`
+      (the token is only checked when PREDICT_WS_TOKEN is set)
+    - client `{"type": "reading", "seq": n, <SensorInput fields>}` →
+      server `{"type": "prediction", "seq": n, "prediction": {...}, "model_version": ...}`
+    - rows are stored every PREDICT_WS_PERSIST_BATCH readings or
+      PREDICT_WS_PERSIST_INTERVAL seconds → server `{"type": "persisted", "seq": n}`
+
+    Every reading is predicted with the factory's current models, so a
+    re-train takes effect on the next reading; the ready message reports the
+    version at connect time and each prediction the version it used.
+    """
+    await websocket.accept()
+    try:
+        hello = json.loads(await asyncio.wait_for(websocket.receive_text(), WS_AUTH_TIMEOUT))
+    except WebSocketDisconnect:
+        return
+    except (asyncio.TimeoutError, ValueError, KeyError):
+        await websocket.close(code=1008, reason="expected auth message")
+        return
+    token = str(hello.get("token") or "") if isinstance(hello, dict) else ""
+    if not isinstance(hello, dict) or hello.get("type") != "auth" or \
+            (PREDICT_WS_TOKEN and not hmac.compare_digest(token, PREDICT_WS_TOKEN)):
+        await websocket.close(code=1008, reason="authentication failed")
+        return
 
-
-# GET → Fetch predictions from DB
-@router.get("/{factory_medicine_id}")
-def get_predictions(factory_medicine_id: str):
     try:
-        print(f"🔹 Fetching predictions for {factory_medicine_id}...")
+        version = model_version(factory_medicine_id)
+    except FileNotFoundError as fnf:
+        await websocket.send_json({"type": "error", "detail": str(fnf)})
+        await websocket.close(code=1011)
+        return
+
+    session = PredictSession(factory_medicine_id)
+    await websocket.send_json({"type": "ready", "model_version": version})
+    metrics.gauge_add("predict_ws_sessions", 1)
+    flusher = asyncio.create_task(_flush_periodically(websocket, session))
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+                seq = message.get("seq")
+                data = SensorInput.model_validate(message)
+            except (ValueError, KeyError, AttributeError, ValidationError) as e:
+                await websocket.send_json({"type": "error", "seq": None, "detail": f"Invalid reading: {e}"})
+                continue
+            if data.acquisition:
+                logger.debug("Acquisition timing", extra={"acquisition": data.acquisition})
+
+            try:
+                result = await _infer(factory_medicine_id, data)
+            except Exception as exc:
+                await websocket.send_json({"type": "error", "seq": seq, "detail": str(exc)})
+                continue
+
+            row = _prediction_row(
+                factory_medicine_id, data, [float(x) for x in result["taste"][0]],
+                float(result["quality"][0]), float(result["dilution"][0]), result["model_version"],
+            )
+            await websocket.send_json({"type": "prediction", "seq": seq, "prediction": _prediction_message(row),
+                                       "model_version": row["model_version"]})
+            metrics.inc("predict_ws_readings_total")
+
+            persisted = await session.add(seq, row)
+            if persisted is not None:
+                await websocket.send_json({"type": "persisted", "seq": persisted})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        flusher.cancel()
+        metrics.gauge_add("predict_ws_sessions", -1)
+        await session.flush()
+        if session.pending:
+            logger.error("Dropped %d unsaved predictions of a closed session for %s",
+                         len(session.pending), factory_medicine_id)
+
+
+# GET → Compact model export for on-device (edge) inference
+@router.get("/{factory_medicine_id}/model")
+def export_model(factory_medicine_id: str, request: Request):
+    """
+    Scaler and SVR models as plain arrays for the Picron agent's numpy
+    evaluator. The ETag is the model version, so devices poll with
+    If-None-Match and only download after a new /train.
+    """
+    try:
+        version = model_version(factory_medicine_id)
+        etag = f'"{version}"'
+        if not_modified(request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        export = export_models(load_models(factory_medicine_id), version)
+        return FastJSONResponse(export, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    except FileNotFoundError as fnf:
+        raise HTTPException(status_code=404, detail=str(fnf))
+    except ValueError as ve:
+        raise HTTPException(status_code=422, detail=str(ve))
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=str(exc))
 
-        res = supabase.table("predicted_data") \
-            .select("*") \
-            .eq("factory_medicine_id", factory_medicine_id) \
-            .order("timestamp", desc=True) \
-            .limit(20) \
-            .execute()
 
-        if not res.data:
-            raise HTTPException(status_code=404, detail="No predictions found for this factory_medicine_id")
+# POST → Store predictions computed on the device
+class EdgePrediction(SensorInput):
+    timestamp: Optional[datetime] = None
+    taste_sweet: float
+    taste_salty: float
+    taste_bitter: float
+    taste_sour: float
+    taste_umami: float
+    quality: float
+    dilution: float
+    model_version: str
+
+
+@router.post("/{factory_medicine_id}/results")
+def insert_edge_predictions(factory_medicine_id: str, results: List[EdgePrediction]):
+    """
+    Batch of predictions the device already computed with an exported model.
+    Results are idempotent per reading_id: a re-sent result (lost response,
+    offline queue replay) is neither stored nor notified twice.
+    """
+    scope = f"results:{factory_medicine_id}"
+    claimed = []
+    try:
+        rows = []
+        for r in results:
+            if r.reading_id is not None:
+                if r.reading_id in claimed:
+                    continue
+                outcome, _ = idempotency.begin(scope, r.reading_id)
+                if outcome != NEW:
+                    continue   # already stored, or being stored by a concurrent request
+                claimed.append(r.reading_id)
+            row = r.model_dump(exclude={"acquisition"})
+            if row["reading_id"] is None:
+                del row["reading_id"]
+            row["factory_medicine_id"] = factory_medicine_id
+            row["timestamp"] = (r.timestamp or datetime.utcnow()).isoformat()
+            rows.append(row)
+            if r.acquisition:
+                logger.debug("Acquisition timing", extra={"acquisition": r.acquisition})
+        if not rows:
+            return {"status": "success", "inserted": 0}
+
+        inserted = _store_predictions(factory_medicine_id, rows)
+        for reading_id in claimed:
+            idempotency.complete(scope, reading_id, None)
+        return {"status": "success", "inserted": len(inserted)}
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=str(exc))
+    finally:
+        for reading_id in claimed:
+            idempotency.release(scope, reading_id)
+
+
+# GET → Fetch predictions (cached window, delta queries, conditional GET)
+def _load_recent(factory_medicine_id: str):
+    recent_predictions.start_load(factory_medicine_id)
+    res = supabase.table("predicted_data") \
+        .select("*") \
+        .eq("factory_medicine_id", factory_medicine_id) \
+        .order("timestamp", desc=True) \
+        .limit(CACHE_SIZE) \
+        .execute()
+    rows = res.data or []
+    recent_predictions.fill(factory_medicine_id, rows)
+    return rows
+
+
+def _fetch_recent(factory_medicine_id: str):
+    rows = recent_predictions.get(factory_medicine_id)
+    if rows is None:
+        # clients polling a cold (or expired) window share one reload
+        rows = flight("predictions").do(factory_medicine_id, lambda: _load_recent(factory_medicine_id))
+    return rows
+
+
+def _fetch_delta(factory_medicine_id: str, since: Optional[datetime], after_id: Optional[int]):
+    """
+    Rows newer than `since` / `after_id`, oldest first, and whether more
+    follow. Answered from the cache only when this process sees every
+    insert and the window covers the range.
+    """
+    if authoritative():
+        rows = _fetch_recent(factory_medicine_id)
+        oldest = rows[-1] if rows else None
+        covered = len(rows) < CACHE_SIZE  # window holds the full history
+        if oldest is not None and not covered:
+            covered = (after_id is None or after_id >= oldest["id"]) and \
+                      (since is None or since >= parse_timestamp(oldest["timestamp"]))
+        if covered:
+            return [
+                r for r in reversed(rows)
+                if (after_id is None or r["id"] > after_id)
+                and (since is None or parse_timestamp(r["timestamp"]) > since)
+            ], False
+
+    query = supabase.table("predicted_data") \
+        .select("*") \
+        .eq("factory_medicine_id", factory_medicine_id)
+    if after_id is not None:
+        query = query.gt("id", after_id)
+    if since is not None:
+        query = query.gt("timestamp", since.isoformat())
+    rows = query.order("id").limit(DELTA_LIMIT + 1).execute().data or []
+    return rows[:DELTA_LIMIT], len(rows) > DELTA_LIMIT
 
-        print("✅ Retrieved predictions")
-        return {"status": "success", "data": res.data}
 
+@router.get("/{factory_medicine_id}")
+def get_predictions(
+    factory_medicine_id: str,
+    request: Request,
+    since: Optional[str] = None,
+    after_id: Optional[int] = None,
+    fmt: str = Query("rows", alias="format"),
+):
+    """
+    Latest predictions for a factory.
+
+    - `since` (ISO timestamp) / `after_id` return only rows newer than that point,
+      oldest first, at most DELTA_LIMIT per page; while `has_more` is true, ask
+      again with `after_id=next_after_id`.
+    - `format=columnar` returns `{"columns": [...], "data": {column: [values]}}`.
+    - Responses carry ETag / Last-Modified; send If-None-Match or
+      If-Modified-Since to get a 304 when nothing changed.
+    """
+    check_format(fmt)
+    try:
+        since_ts = parse_timestamp(since) if since else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid 'since' timestamp: {since}")
+
+    try:
+        logger.debug("Fetching predictions for %s", factory_medicine_id)
+        page = None
+        if since_ts is None and after_id is None:
+            data = _fetch_recent(factory_medicine_id)
+            if not data:
+                raise HTTPException(status_code=404, detail="No predictions found for this factory_medicine_id")
+        else:
+            data, has_more = _fetch_delta(factory_medicine_id, since_ts, after_id)
+            page = {"has_more": has_more, "next_after_id": data[-1]["id"] if data else after_id}
+
+        digest = hashlib.sha1(
+            f"{factory_medicine_id}|{since}|{after_id}|{fmt}|".encode() +
+            ",".join(f"{r.get('id')}:{r.get('timestamp')}" for r in data).encode()
+        ).hexdigest()
+        etag = f'W/"{digest}"'
+        last_modified = max((parse_timestamp(r["timestamp"]) for r in data), default=None)
+
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if last_modified is not None:
+            headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+        if not_modified(request, etag, last_modified):
+            return Response(status_code=304, headers=headers)
+
+        logger.debug("Retrieved %d predictions", len(data))
+        body = {"status": "success", "count": len(data), "data": shape(data, fmt)}
+        if page is not None:
+            body.update(page)
+        return FastJSONResponse(body, headers=headers)
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
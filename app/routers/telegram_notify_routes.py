@@ -1,49 +1,76 @@
-from fastapi import APIRouter, HTTPException, Body
-import requests
-import os
-from app.database import supabase
+from fastapi import APIRouter, HTTPException, Body, Header
+from typing import Optional
+from app.utils.telegram_dispatcher import dispatcher
+from app.utils.notification_digest import digests
+from app.utils.notification_outbox import outbox
 
 router = APIRouter()
 
-# 🔹 Your Telegram Bot Token
-TELEGRAM_BOT_TOKEN = "8347556033:AAFfDhKFNGBOk7qag0zdi9Jfj5y2sm54THI"
-TELEGRAM_API_URL = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-
 @router.post("/telegramnotify/{factory_medicine_id}")
-def notify_factory(factory_medicine_id: str, message: dict = Body(...)):
+def notify_factory(
+    factory_medicine_id: str,
+    message: dict = Body(...),
+    idempotency_key: Optional[str] = Header(None),
+):
     """
-    Send notification message (JSON body) to all chat_ids registered
-    for a given factory_medicine_id in Supabase.
+    Queue a notification message (JSON body) for all chat_ids registered
+    for a given factory_medicine_id. Delivery happens in the background;
+    re-sending with the same Idempotency-Key header does not notify twice.
     """
     try:
-        # 🔹 1. Fetch all chat_ids for this factory
-        res = supabase.table("telegram_factory_map")\
-                      .select("chat_id")\
-                      .eq("factory_medicine_id", factory_medicine_id)\
-                      .execute()
+        # 🔹 1. Prepare message (convert dict to text for Telegram)
+        text_message = f"📢 Notification for {factory_medicine_id}:\n{message}"
 
-        chat_ids = [row["chat_id"] for row in res.data]
+        # 🔹 2. Enqueue for every subscribed chat_id (durable outbox)
+        key = f"notify:{factory_medicine_id}:{idempotency_key}" if idempotency_key else None
+        chat_ids = outbox.notify_factory(factory_medicine_id, text_message, key=key)
         if not chat_ids:
             raise HTTPException(status_code=404, detail="No chat_ids found for this factory_medicine_id")
 
-        # 🔹 2. Prepare message (convert dict to text for Telegram)
-        text_message = f"📢 Notification for {factory_medicine_id}:\n{message}"
-
-        # 🔹 3. Send to each chat_id
-        for chat_id in chat_ids:
-            payload = {
-                "chat_id": chat_id,
-                "text": text_message
-            }
-            r = requests.post(TELEGRAM_API_URL, json=payload)
-            if r.status_code != 200:
-                print(f"⚠️ Failed to send to {chat_id}: {r.text}")
-
         return {
-            "status": "success",
+            "status": "queued",
             "factory_medicine_id": factory_medicine_id,
-            "sent_to": chat_ids
+            "queued_to": chat_ids
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/telegramnotify/stats")
+def notify_stats():
+    """Outbox depth plus delivery counters and latency of the Telegram dispatcher."""
+    return {"status": "success", "data": {"outbox": outbox.stats(), "dispatcher": dispatcher.stats()}}
+
+
+@router.get("/telegramnotify/deadletter")
+def list_dead_letters(limit: int = 100):
+    """Notifications that could not be delivered."""
+    return {"status": "success", "data": outbox.dead_letters(limit)}
+
+
+@router.post("/telegramnotify/deadletter/requeue")
+def requeue_dead_letters():
+    """Move every dead-lettered notification back into the outbox."""
+    return {"status": "success", "requeued": outbox.requeue_dead_letters()}
+
+
+@router.get("/telegramnotify/config/{factory_medicine_id}")
+def get_notify_config(factory_medicine_id: str):
+    """Digest window and alert thresholds used for this factory."""
+    return {"status": "success", "factory_medicine_id": factory_medicine_id, "config": digests.get_config(factory_medicine_id)}
+
+
+@router.put("/telegramnotify/config/{factory_medicine_id}")
+def set_notify_config(factory_medicine_id: str, config: dict = Body(...)):
+    """
+    Update digest settings for a factory, e.g.
+    {"window": 30, "quality_min": 0.6, "dilution_max": 1.5}.
+    window = 0 sends every prediction individually.
+    """
+    try:
+        return {"status": "success", "factory_medicine_id": factory_medicine_id, "config": digests.set_config(factory_medicine_id, config)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
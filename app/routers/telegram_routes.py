@@ -1,53 +1,63 @@
-import time
 from fastapi import APIRouter, HTTPException
-import requests
-from app.database import supabase, TELEGRAM_BOT_TOKEN
+import logging
+import time
+from app.utils.telegram_updates import consumer, REGISTRATION_WINDOW
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
-BASE_URL = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}"
-
-@router.get("/{factory_medicine}")
-def check_telegram(factory_medicine: str):
-    try:
-        print(f"🔹 Checking Telegram for message: {factory_medicine}")
-
-        timeout = 30
-        start = time.time()
-        last_update_id = None
-        collected_data = []  # store all chat_ids here
-
-        while time.time() - start < timeout:
-            url = f"{BASE_URL}/getUpdates"
-            if last_update_id:
-                url += f"?offset={last_update_id + 1}"
+POLL_INTERVAL = 1  # seconds between status checks while the legacy GET waits
 
-            res = requests.get(url).json()
 
-            if "result" in res:
-                for update in res["result"]:
-                    last_update_id = update["update_id"]
-                    if "message" in update:
-                        text = update["message"].get("text", "").strip()
-                        chat_id = update["message"]["chat"]["id"]
+@router.post("/{factory_medicine}")
+def start_registration(factory_medicine: str):
+    """
+    Open a registration window for a factory. Any chat that sends the
+    factory_medicine id to the bot within the window gets subscribed.
+    Poll GET /telegram/{factory_medicine}/status for the result.
+    """
+    try:
+        logger.info("Starting Telegram registration for %s", factory_medicine)
+        registration = consumer.start_registration(factory_medicine)
+        return {
+            "status": "pending",
+            "message": f"Send '{factory_medicine}' to the bot within {REGISTRATION_WINDOW}s",
+            "status_url": f"/telegram/{factory_medicine}/status",
+            "registration": registration
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Telegram error: {str(e)}")
 
-                        print(f"📩 Received: {text} from chat_id={chat_id}")
 
-                        if text == factory_medicine:
-                            collected_data.append({
-                                "factory_medicine_id": factory_medicine,
-                                "chat_id": str(chat_id)
-                            })
+@router.get("/{factory_medicine}/status")
+def registration_status(factory_medicine: str):
+    """Result of the latest registration: pending, success or timeout (non-blocking)."""
+    registration = consumer.get_registration(factory_medicine)
+    if registration is None:
+        raise HTTPException(status_code=404, detail=f"No registration started for {factory_medicine}")
 
-            time.sleep(2)  # avoid flooding
+    if registration["status"] == "timeout":
+        return {"status": "timeout", "message": f"No matches for {factory_medicine} in {REGISTRATION_WINDOW}s"}
+    return {"status": registration["status"], "inserted": registration["inserted"], "registration": registration}
 
-        # ✅ After 30 sec, insert into Supabase
-        if collected_data:
-            response = supabase.table("telegram_factory_map").insert(collected_data).execute()
-            print(f"✅ Inserted {len(collected_data)} rows into Supabase")
-            return {"status": "success", "inserted": collected_data}
-        else:
-            return {"status": "timeout", "message": f"No matches for {factory_medicine} in 30s"}
 
+@router.get("/{factory_medicine}")
+def check_telegram(factory_medicine: str):
+    """
+    Original blocking endpoint, kept for existing clients: opens a
+    registration window, waits for it to close and returns every chat
+    mapped during it. New clients should POST and poll /status instead.
+    """
+    try:
+        logger.info("Checking Telegram for %s (blocking)", factory_medicine)
+        registration = consumer.start_registration(factory_medicine)
+        deadline = time.monotonic() + registration["expires_in"]
+        while time.monotonic() < deadline:
+            time.sleep(min(POLL_INTERVAL, max(0, deadline - time.monotonic())))
+            registration = consumer.get_registration(factory_medicine) or registration
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Telegram error: {str(e)}")
+
+    if registration["inserted"]:
+        return {"status": "success", "inserted": registration["inserted"]}
+    return {"status": "timeout", "message": f"No matches for {factory_medicine} in {REGISTRATION_WINDOW}s"}
@@ -1,20 +1,24 @@
 from fastapi import APIRouter, HTTPException
 from app.utils.trainer import fetch_data, train_models, upload_model
+from app.utils.metrics import span
 
 router = APIRouter()
 
 @router.post("/{factory_medicine_id}")
 def train(factory_medicine_id: str):
     try:
-        df = fetch_data(factory_medicine_id)
+        with span("train.fetch_data"):
+            df = fetch_data(factory_medicine_id)
         if df.empty:
             raise HTTPException(status_code=404, detail="No data found for this factory_medicine_id")
 
-        model_paths = train_models(df, factory_medicine_id)
+        with span("train.fit"):
+            model_paths = train_models(df, factory_medicine_id)
 
         uploaded_urls = []
         for path in model_paths:
-            url = upload_model(path)
+            with span("train.upload_model"):
+                url = upload_model(path)
             uploaded_urls.append(url)
 
         return {"status": "success", "uploaded_models": uploaded_urls}
@@ -1,8 +1,10 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, Optional
 from datetime import datetime
 
 class SensorData(BaseModel):
+    # Client-generated id; makes device retries / bulk re-uploads idempotent
+    reading_id: Optional[str] = None
     factory_medicine_id: str
     timestamp: datetime
     temperature: float
@@ -20,6 +22,8 @@ class SensorData(BaseModel):
     taste_umami: Optional[float] = None
     quality: Optional[float] = None
     dilution: Optional[float] = None
+    # Per-phase device timings (settle_ms, acquire_ms, readings, ...); logged, not stored
+    acquisition: Optional[Dict[str, float]] = None
 
 
 class PicronData(BaseModel):
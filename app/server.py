@@ -0,0 +1,131 @@
+"""
+Preforking launcher: load and warm models once, then fork the workers.
+
+    python -m app.server --workers 4 --host 0.0.0.0 --port 8000
+
+The parent imports the app, loads every trained factory's models
+(PRELOAD_FACTORIES to restrict), runs a synthetic prediction through each,
+freezes the GC generations and binds the listening socket. Workers are then
+forked from it, so the model arrays are shared copy-on-write instead of each
+worker unpickling its own copy, and /ready is true from the first request.
+For that sharing to be used, inference runs in each worker's own threads
+(INFERENCE_WORKERS defaults to 0 here); setting INFERENCE_WORKERS > 0 gives
+every worker a pool of spawned processes that load private model copies.
+The parent restarts workers that die and forwards SIGTERM/SIGINT.
+
+Plain `uvicorn app.main:app` still works; it warms models in the lifespan
+hook instead. Requires os.fork (Linux / macOS).
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+
+import uvicorn
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def preload():
+    """Import the app and warm all models in the parent (before any worker exists)."""
+    # predict from the warmed, fork-shared model_cache unless explicitly overridden
+    os.environ.setdefault("INFERENCE_WORKERS", "0")
+    from app.main import app
+    from app.utils.model_cache import model_cache
+
+    warmed = model_cache.warm()
+    # Objects created so far are never collected; moving them out of the
+    # tracked generations keeps GC passes in the workers from touching
+    # (and un-sharing) their pages.
+    gc.collect()
+    gc.freeze()
+    print(f"Preloaded models for {len(warmed)} factories in {model_cache.warm_seconds}s "
+          f"({gc.get_freeze_count()} objects frozen)", flush=True)
+    return app
+
+
+def run_worker(app, sock: socket.socket, index: int, args):
+    os.environ["WORKER_INDEX"] = str(index)
+    config = uvicorn.Config(app, log_level=args.log_level, timeout_keep_alive=args.keep_alive, access_log=False)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def spawn(app, sock, index: int, args) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(app, sock, index, args)
+        except BaseException:
+            # logging belongs to the worker's lifespan, which may not have started
+            traceback.print_exc()
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PhotonTroppers preforking server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "2")))
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--keep-alive", type=int, default=5)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        sys.exit("app.server needs os.fork; use `uvicorn app.main:app --workers N` on this platform")
+
+    # the worker count, for per-process shares of bot-wide limits (TELEGRAM_GLOBAL_RATE)
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)
+    app = preload()
+    sock = bind_socket(args.host, args.port, args.backlog)
+    print(f"Listening on {args.host}:{args.port} with {args.workers} workers", flush=True)
+
+    workers = {spawn(app, sock, i, args): i for i in range(args.workers)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        index = workers.pop(pid, None)
+        if index is None or stopping:
+            continue
+        print(f"Worker {index} (pid {pid}) exited with status {status}; restarting", flush=True)
+        time.sleep(1)
+        workers[spawn(app, sock, index, args)] = index
+
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
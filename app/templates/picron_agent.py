@@ -0,0 +1,713 @@
+import smbus
+import time
+import struct
+import board
+import busio
+import adafruit_ads1x15.ads1115 as ADS
+from adafruit_ads1x15.analog_in import AnalogIn
+import RPi.GPIO as GPIO
+import requests
+from datetime import datetime
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import uuid
+
+# --- API Configuration ---
+BASE_URL = "__BASE_URL__"
+FACTORY_MEDICINE_ID = "__FACTORY_MEDICINE_ID__"
+AGENT_VERSION = "__AGENT_VERSION__"
+UPDATE_CHECK_INTERVAL = 3600  # seconds between self-update checks
+
+# --- Offline Queue ---
+# Readings that cannot be uploaded are kept here and flushed when the API is back.
+QUEUE_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), f"{FACTORY_MEDICINE_ID}_queue.db")
+FLUSH_BATCH_SIZE = 50
+FLUSH_INTERVAL = 30  # seconds between flush attempts while readings are queued
+
+# --- Edge Inference ---
+# PICRON_EDGE_INFERENCE=1 predicts on the device with the model exported by
+# GET /predict/{id}/model and uploads results in the background.
+EDGE_INFERENCE = os.getenv("PICRON_EDGE_INFERENCE", "0") == "1"
+MODEL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), f"{FACTORY_MEDICINE_ID}_model.json")
+MODEL_CHECK_INTERVAL = 300  # seconds between checks for a newer model
+FEATURE_KEYS = ["temperature", "mq3_ppm", "as7263_r", "as7263_s", "as7263_t", "as7263_u", "as7263_v", "as7263_w"]
+
+# --- Streaming Predictions ---
+# PICRON_USE_WEBSOCKET=1 sends prediction readings over one WebSocket session
+# (/predict/ws/{id}, needs the `websockets` package) instead of a POST each.
+USE_WEBSOCKET = os.getenv("PICRON_USE_WEBSOCKET", "0") == "1"
+WS_TOKEN = os.getenv("PICRON_WS_TOKEN", "")
+
+# One keep-alive session for every API call
+SESSION = requests.Session()
+
+# --- Hardware Configuration ---
+IR_SENSOR_PIN = 16
+IR_SENSOR_ACTIVE_LOW = True
+ACCESS_DOOR_PIN = 25
+DELAY_AFTER_TRIGGER = 2
+READING_INTERVAL = 0.005
+NUM_READINGS = 10       # upper bound; sampling stops early once values converge
+MIN_READINGS = 3
+CONVERGENCE_TOLERANCE = 0.005  # max relative change of the weighted averages between readings
+ALPHA = 0.3
+
+# --- AS726X Sensor Constants (abbreviated for clarity) ---
+AS726X_ADDR = 0x49
+AS726x_CONTROL_SETUP = 0x04
+AS726x_LED_CONTROL = 0x07
+AS726x_INT_T = 0x05
+AS726x_HW_VERSION = 0x01
+AS72XX_SLAVE_STATUS_REG = 0x00
+AS72XX_SLAVE_WRITE_REG = 0x01
+AS72XX_SLAVE_READ_REG = 0x02
+AS72XX_SLAVE_TX_VALID = 0x02
+AS72XX_SLAVE_RX_VALID = 0x01
+SENSORTYPE_AS7263 = 0x3F
+AS7263_R_CAL = 0x14
+AS7263_S_CAL = 0x18
+AS7263_T_CAL = 0x1C
+AS7263_U_CAL = 0x20
+AS7263_V_CAL = 0x24
+AS7263_W_CAL = 0x28
+POLLING_DELAY = 0.005
+POLL_SPINS = 20         # status reads without sleeping before falling back to POLLING_DELAY
+INTEGRATION_TIME = 50   # AS726x_INT_T value, x 2.8 ms per integration
+MAX_RETRIES = 3
+TIMEOUT = 3.0
+CAL_BLOCK_START = AS7263_R_CAL   # R..W calibrated floats are 24 contiguous virtual registers
+CAL_BLOCK_LENGTH = 24
+
+class AS726X:
+    """Abridged AS726X sensor class for brevity. Assumes AS7263."""
+    def __init__(self, i2c_bus=1, address=AS726X_ADDR):
+        self.bus = smbus.SMBus(i2c_bus)
+        self.address = address
+        self.sensor_version = 0
+        self.control_setup = None  # last value written to CONTROL_SETUP
+
+    def begin(self, gain=3, measurement_mode=3):
+        try:
+            self.sensor_version = self.virtual_read_register(AS726x_HW_VERSION)
+            if self.sensor_version != SENSORTYPE_AS7263:
+                print(f" Invalid sensor version: {self.sensor_version:02X}")
+                return False
+            self.virtual_write_register(AS726x_INT_T, INTEGRATION_TIME)
+            value = self.virtual_read_register(AS726x_CONTROL_SETUP)
+            value &= 0b11000011
+            value |= (gain << 4) | (measurement_mode << 2)
+            self.virtual_write_register(AS726x_CONTROL_SETUP, value)
+            self.control_setup = value
+            value = self.virtual_read_register(AS726x_LED_CONTROL)
+            value &= 0b11111110
+            self.virtual_write_register(AS726x_LED_CONTROL, value)
+            return True
+        except Exception as e:
+            print(f" Error initializing sensor: {e}")
+            return False
+
+    def take_measurements(self):
+        try:
+            # Reuse the cached CONTROL_SETUP instead of reading it back, and clear
+            # DATA_RDY + select one-shot mode 3 in a single write.
+            if self.control_setup is None:
+                self.control_setup = self.virtual_read_register(AS726x_CONTROL_SETUP)
+            value = (self.control_setup & ~(1 << 1)) | (3 << 2)
+            self.virtual_write_register(AS726x_CONTROL_SETUP, value)
+            self.control_setup = value
+            start_time = time.time()
+            # Mode 3 needs two integration periods; don't poll before they can be done
+            time.sleep(2 * INTEGRATION_TIME * 0.0028)
+            while not (self.virtual_read_register(AS726x_CONTROL_SETUP) & (1 << 1)):
+                time.sleep(POLLING_DELAY)
+                if time.time() - start_time > TIMEOUT:
+                    raise Exception("Timeout waiting for data")
+            return True
+        except Exception as e:
+            print(f" Error taking measurements: {e}")
+            return False
+
+    def get_calibrated_values(self):
+        try:
+            raw = self.virtual_read_block(CAL_BLOCK_START, CAL_BLOCK_LENGTH)
+            return list(struct.unpack('>6f', raw))
+        except Exception:
+            return [-1.0] * 6
+
+    def wait_status(self, mask, want_set):
+        """Spin on the status register, sleeping only if the bit takes a while."""
+        spins = 0
+        while bool(self.read_register(AS72XX_SLAVE_STATUS_REG) & mask) != want_set:
+            spins += 1
+            if spins > POLL_SPINS:
+                time.sleep(POLLING_DELAY)
+
+    def virtual_read_block(self, start_addr, length):
+        """
+        Read consecutive virtual registers. The slave interface moves one byte
+        per handshake, but a stale RX byte only needs draining once per block.
+        """
+        if self.read_register(AS72XX_SLAVE_STATUS_REG) & AS72XX_SLAVE_RX_VALID:
+            self.read_register(AS72XX_SLAVE_READ_REG)
+        out = bytearray()
+        for addr in range(start_addr, start_addr + length):
+            for _ in range(MAX_RETRIES + 1):
+                self.wait_status(AS72XX_SLAVE_TX_VALID, False)
+                self.write_register(AS72XX_SLAVE_WRITE_REG, addr)
+                self.wait_status(AS72XX_SLAVE_RX_VALID, True)
+                result = self.read_register(AS72XX_SLAVE_READ_REG)
+                if result != 0xFF:
+                    break
+            out.append(result)
+        return bytes(out)
+
+    def virtual_read_register(self, virtual_addr):
+        for _ in range(MAX_RETRIES + 1):
+            status = self.read_register(AS72XX_SLAVE_STATUS_REG)
+            if status & AS72XX_SLAVE_RX_VALID: self.read_register(AS72XX_SLAVE_READ_REG)
+            while self.read_register(AS72XX_SLAVE_STATUS_REG) & AS72XX_SLAVE_TX_VALID: time.sleep(POLLING_DELAY)
+            self.write_register(AS72XX_SLAVE_WRITE_REG, virtual_addr)
+            while not (self.read_register(AS72XX_SLAVE_STATUS_REG) & AS72XX_SLAVE_RX_VALID): time.sleep(POLLING_DELAY)
+            result = self.read_register(AS72XX_SLAVE_READ_REG)
+            if result != 0xFF: return result
+        return 0xFF
+
+    def virtual_write_register(self, virtual_addr, data_to_write):
+        for _ in range(MAX_RETRIES + 1):
+            while self.read_register(AS72XX_SLAVE_STATUS_REG) & AS72XX_SLAVE_TX_VALID: time.sleep(POLLING_DELAY)
+            self.write_register(AS72XX_SLAVE_WRITE_REG, virtual_addr | 0x80)
+            while self.read_register(AS72XX_SLAVE_STATUS_REG) & AS72XX_SLAVE_TX_VALID: time.sleep(POLLING_DELAY)
+            if self.write_register(AS72XX_SLAVE_WRITE_REG, data_to_write) == 0: return 0
+        return -1
+
+    def read_register(self, addr):
+        try: return self.bus.read_byte_data(self.address, addr)
+        except Exception: return 0xFF
+
+    def write_register(self, addr, val):
+        try:
+            self.bus.write_byte_data(self.address, addr, val)
+            return 0
+        except Exception: return -1
+
+def exponential_weighted_average(previous, current, alpha):
+    if previous is None: return current
+    return alpha * current + (1 - alpha) * previous
+
+def is_ir_sensor_active():
+    ir_state = GPIO.input(IR_SENSOR_PIN)
+    return not ir_state if IR_SENSOR_ACTIVE_LOW else ir_state
+
+def reset_status():
+    print("\n Attempting to reset status to 0...")
+    try:
+        url_get = f"{BASE_URL}/picron/{FACTORY_MEDICINE_ID}"
+        res = SESSION.get(url_get, timeout=5)
+        if res.status_code != 200:
+            print(f" Failed fetching current picron row for reset: {res.text}")
+            return
+        row = res.json().get("data", [{}])[0]
+        payload = {k: row.get(k) for k in ["factory_medicine_id", "taste_sweet", "taste_salty", "taste_bitter", "taste_sour", "taste_umami", "quality", "dilution", "factory"]}
+        payload["status"] = 0
+        
+        url_post = f"{BASE_URL}/picron/{FACTORY_MEDICINE_ID}"
+        res = SESSION.post(url_post, json=payload, timeout=5)
+        if res.status_code == 200:
+            print(" Status successfully reset to 0.")
+        else:
+            print(f" Failed to reset status: {res.text}")
+    except requests.exceptions.RequestException as e:
+        print(f" API connection error during reset: {e}")
+
+def handle_status_reset_with_countdown():
+    print("\n Measurement complete. Please remove the sample.")
+    while is_ir_sensor_active():
+        time.sleep(0.2)
+    
+    print(" Sample removed. Starting 15-second countdown to reset status.")
+    for i in range(15, 0, -1):
+        print(f"Resetting in {i} seconds... (Do not re-insert sample)")
+        time.sleep(1)
+        if is_ir_sensor_active():
+            print("\n Countdown aborted! Sample re-detected. Reset cancelled.")
+            return
+    reset_status()
+
+def has_converged(previous, current):
+    for p, c in zip(previous, current):
+        if abs(c - p) > CONVERGENCE_TOLERANCE * max(abs(p), 1e-6):
+            return False
+    return True
+
+def take_all_readings():
+    """Returns (spectral, alcohol, timing); spectral/alcohol are None on abort."""
+    print("Waiting for sample placement...")
+    while not is_ir_sensor_active():
+        time.sleep(0.2)
+    
+    print(f" Sample detected. Waiting {DELAY_AFTER_TRIGGER}s before measurement...")
+    settle_start = time.perf_counter()
+    time.sleep(DELAY_AFTER_TRIGGER)
+    timing = {"settle_ms": (time.perf_counter() - settle_start) * 1000}
+
+    if not is_ir_sensor_active():
+        print(" Sample removed prematurely. Aborting.")
+        return None, None, timing
+
+    weighted_spectral_values = None
+    weighted_alcohol_value = None
+    readings_taken = 0
+    measure_s = 0.0
+    read_s = 0.0
+    converged = False
+    acquire_start = time.perf_counter()
+
+    for i in range(NUM_READINGS):
+        if not is_ir_sensor_active():
+            print(f" Sample removed after {readings_taken} readings. Aborting.")
+            return None, None, timing
+        
+        print(f"    Reading {i+1}/{NUM_READINGS}...")
+        
+        t0 = time.perf_counter()
+        measured = sensor.take_measurements()
+        t1 = time.perf_counter()
+        spectral_values = sensor.get_calibrated_values() if measured else [-1.0] * 6
+        alcohol_value = alcohol_chan.voltage if alcohol_sensor_available else -1.0
+        measure_s += t1 - t0
+        read_s += time.perf_counter() - t1
+        
+        previous = None
+        if weighted_spectral_values is None:
+            weighted_spectral_values = spectral_values
+        else:
+            previous = weighted_spectral_values + [weighted_alcohol_value]
+            for j in range(6):
+                weighted_spectral_values[j] = exponential_weighted_average(weighted_spectral_values[j], spectral_values[j], ALPHA)
+        
+        weighted_alcohol_value = exponential_weighted_average(weighted_alcohol_value, alcohol_value, ALPHA)
+        readings_taken += 1
+
+        if readings_taken >= MIN_READINGS and previous is not None and \
+                has_converged(previous, weighted_spectral_values + [weighted_alcohol_value]):
+            converged = True
+            print(f"    Converged after {readings_taken} readings.")
+            break
+        if i < NUM_READINGS - 1:
+            time.sleep(READING_INTERVAL)
+
+    timing.update({
+        "acquire_ms": (time.perf_counter() - acquire_start) * 1000,
+        "measure_ms": measure_s * 1000,
+        "register_read_ms": read_s * 1000,
+        "readings": readings_taken,
+        "converged": int(converged),
+    })
+    return weighted_spectral_values, weighted_alcohol_value, timing
+
+class ReadingQueue:
+    """Append-only on-device queue (SQLite) of readings waiting for upload."""
+
+    def __init__(self, path=QUEUE_DB):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS queue (reading_id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+        self.last_flush = 0.0
+
+    def put(self, kind, payload):
+        self.conn.execute(
+            "INSERT OR IGNORE INTO queue VALUES (?, ?, ?, ?)",
+            (payload["reading_id"], kind, json.dumps(payload), time.time()),
+        )
+        self.conn.commit()
+        print(f" Reading queued offline ({self.size()} waiting).")
+
+    def size(self):
+        return self.conn.execute("SELECT COUNT(*) FROM queue").fetchone()[0]
+
+    def take(self, kind, limit):
+        rows = self.conn.execute(
+            "SELECT reading_id, payload FROM queue WHERE kind = ? ORDER BY created_at LIMIT ?", (kind, limit)
+        ).fetchall()
+        return [(reading_id, json.loads(payload)) for reading_id, payload in rows]
+
+    def remove(self, reading_ids):
+        self.conn.executemany("DELETE FROM queue WHERE reading_id = ?", [(r,) for r in reading_ids])
+        self.conn.commit()
+
+    def flush(self, force=False):
+        """Upload queued readings: dataset rows in batches to /data/bulk, predictions one by one."""
+        if not force and time.time() - self.last_flush < FLUSH_INTERVAL:
+            return
+        self.last_flush = time.time()
+        try:
+            while True:
+                batch = self.take("data", FLUSH_BATCH_SIZE)
+                if not batch:
+                    break
+                res = SESSION.post(f"{BASE_URL}/data/bulk", json=[p for _, p in batch], timeout=30)
+                if res.status_code != 200:
+                    print(f" Bulk upload failed: {res.status_code} {res.text}")
+                    return
+                self.remove([r for r, _ in batch])
+                print(f" Flushed {len(batch)} queued dataset readings.")
+
+            while True:
+                batch = self.take("result", FLUSH_BATCH_SIZE)
+                if not batch:
+                    break
+                res = SESSION.post(f"{BASE_URL}/predict/{FACTORY_MEDICINE_ID}/results", json=[p for _, p in batch], timeout=30)
+                if res.status_code != 200:
+                    print(f" Result upload failed: {res.status_code} {res.text}")
+                    return
+                self.remove([r for r, _ in batch])
+                print(f" Flushed {len(batch)} queued edge predictions.")
+
+            for reading_id, payload in self.take("predict", FLUSH_BATCH_SIZE):
+                res = SESSION.post(f"{BASE_URL}/predict/{FACTORY_MEDICINE_ID}", json=payload, timeout=10)
+                if res.status_code >= 500:
+                    print(f" Queued predict upload failed: {res.status_code} {res.text}")
+                    return
+                self.remove([reading_id])
+        except requests.exceptions.RequestException as e:
+            print(f" Still offline, {self.size()} readings queued: {e}")
+
+class EdgeModel:
+    """numpy-only evaluator for a model exported by GET /predict/{id}/model."""
+
+    def __init__(self, export):
+        import numpy as np
+        self.np = np
+        self.version = export["model_version"]
+        self.mean = np.asarray(export["scaler"]["mean"], dtype=float)
+        self.scale = np.asarray(export["scaler"]["scale"], dtype=float)
+        self.svrs = [self._prepare(m) for m in export["taste"] + [export["quality"], export["dilution"]]]
+
+    def _prepare(self, m):
+        np = self.np
+        sv = np.asarray(m["support_vectors"], dtype=float).reshape(-1, len(self.mean))
+        return sv, np.asarray(m["dual_coef"], dtype=float), m["intercept"], m["gamma"]
+
+    def predict(self, features):
+        """Returns (taste[5], quality, dilution) for one reading."""
+        np = self.np
+        x = (np.asarray(features, dtype=float) - self.mean) / self.scale
+        out = [float(np.exp(-gamma * ((sv - x) ** 2).sum(axis=1)) @ dual_coef + intercept)
+               for sv, dual_coef, intercept, gamma in self.svrs]
+        return out[:5], out[5], out[6]
+
+def load_edge_model():
+    global edge_model
+    try:
+        with open(MODEL_FILE) as f:
+            edge_model = EdgeModel(json.load(f))
+        print(f" Edge model {edge_model.version} loaded.")
+    except (OSError, ValueError, KeyError) as e:
+        print(f" No usable local edge model: {e}")
+
+def refresh_edge_model():
+    """Download the exported model only if its version differs from the local one."""
+    global edge_model
+    headers = {"If-None-Match": f'"{edge_model.version}"'} if edge_model else {}
+    try:
+        res = SESSION.get(f"{BASE_URL}/predict/{FACTORY_MEDICINE_ID}/model", headers=headers, timeout=30)
+        if res.status_code == 304:
+            return
+        if res.status_code != 200:
+            print(f" Model check failed: {res.status_code} {res.text}")
+            return
+        export = res.json()
+        edge_model = EdgeModel(export)
+        tmp_path = MODEL_FILE + ".new"
+        with open(tmp_path, "w") as f:
+            json.dump(export, f)
+        os.replace(tmp_path, MODEL_FILE)
+        print(f" Edge model updated to {edge_model.version}.")
+    except (requests.exceptions.RequestException, OSError, ValueError) as e:
+        print(f" Model check error: {e}")
+
+class ResultUploader:
+    """Uploads edge predictions from a background thread; failures go to the offline queue."""
+
+    def __init__(self):
+        self.pending = queue.Queue()
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def submit(self, result):
+        self.pending.put(result)
+
+    def run(self):
+        # SQLite connections are per thread, so the uploader opens its own
+        offline = ReadingQueue()
+        while True:
+            batch = [self.pending.get()]
+            while not self.pending.empty() and len(batch) < FLUSH_BATCH_SIZE:
+                batch.append(self.pending.get_nowait())
+            try:
+                res = SESSION.post(f"{BASE_URL}/predict/{FACTORY_MEDICINE_ID}/results", json=batch, timeout=10)
+                if res.status_code == 200:
+                    continue
+                print(f" Result upload failed: {res.status_code} {res.text}")
+            except requests.exceptions.RequestException as e:
+                print(f" API connection error uploading results: {e}")
+            for result in batch:
+                offline.put("result", result)
+
+class PredictionStream:
+    """WebSocket prediction session, opened on first use and reopened after errors."""
+
+    def __init__(self):
+        self.conn = None
+        self.seq = 0
+
+    def connect(self):
+        from websockets.sync.client import connect
+        url = BASE_URL.replace("https://", "wss://", 1).replace("http://", "ws://", 1)
+        self.conn = connect(f"{url}/predict/ws/{FACTORY_MEDICINE_ID}", open_timeout=10)
+        self.conn.send(json.dumps({"type": "auth", "token": WS_TOKEN, "agent_version": AGENT_VERSION}))
+        hello = json.loads(self.conn.recv(timeout=10))
+        if hello.get("type") != "ready":
+            raise RuntimeError(hello.get("detail", hello))
+        print(f" Prediction stream open (model {hello['model_version']}).")
+
+    def predict(self, payload):
+        if self.conn is None:
+            self.connect()
+        self.seq += 1
+        try:
+            self.conn.send(json.dumps(dict(payload, type="reading", seq=self.seq)))
+            while True:
+                message = json.loads(self.conn.recv(timeout=10))
+                if message.get("type") == "persisted":
+                    continue
+                # an error without a seq is the server rejecting the reading itself
+                if message.get("type") == "error" and message.get("seq") in (self.seq, None):
+                    raise RuntimeError(message.get("detail"))
+                if message.get("seq") != self.seq:
+                    continue
+                return message["prediction"]
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
+
+def handle_dataset_flow(row):
+    print("\n--- STATUS 1: DATASET ENTRY ---")
+    spectral, alcohol, timing = take_all_readings()
+    
+    if spectral is None or alcohol is None:
+        print("Measurement failed. Skipping API post.")
+        reset_status()
+        return
+
+    payload = {
+        "reading_id": str(uuid.uuid4()),
+        "factory_medicine_id": FACTORY_MEDICINE_ID,
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "temperature": 0,
+        "mq3_ppm": alcohol,
+        "as7263_r": spectral[0], "as7263_s": spectral[1], "as7263_t": spectral[2],
+        "as7263_u": spectral[3], "as7263_v": spectral[4], "as7263_w": spectral[5],
+        "taste_sweet": row.get("taste_sweet", 0), "taste_salty": row.get("taste_salty", 0),
+        "taste_bitter": row.get("taste_bitter", 0), "taste_sour": row.get("taste_sour", 0),
+        "taste_umami": row.get("taste_umami", 0), "quality": row.get("quality", "N/A"),
+        "dilution": row.get("dilution", 1.0),
+        "acquisition": timing,
+    }
+
+    try:
+        url = f"{BASE_URL}/data/"
+        print(" Sending data to API...")
+        res = SESSION.post(url, json=payload, timeout=10)
+        if res.status_code == 200:
+            print(" Dataset POST successful:", res.json())
+        elif res.status_code >= 500:
+            print(f" Dataset POST failed: {res.status_code} {res.text}")
+            reading_queue.put("data", payload)
+        else:
+            print(f" Dataset POST failed: {res.status_code} {res.text}")
+    except requests.exceptions.RequestException as e:
+        print(f" API connection error: {e}")
+        reading_queue.put("data", payload)
+
+    handle_status_reset_with_countdown()
+
+def handle_predict_flow():
+    print("\n--- STATUS 2: PREDICTION ---")
+    spectral, alcohol, timing = take_all_readings()
+    
+    if spectral is None or alcohol is None:
+        print("Measurement failed. Skipping API post.")
+        reset_status()
+        return
+
+    payload = {
+        "reading_id": str(uuid.uuid4()),
+        "temperature": 0, "mq3_ppm": alcohol, "as7263_r": spectral[0],
+        "as7263_s": spectral[1], "as7263_t": spectral[2], "as7263_u": spectral[3],
+        "as7263_v": spectral[4], "as7263_w": spectral[5],
+        "acquisition": timing,
+    }
+    
+    if EDGE_INFERENCE and edge_model is not None:
+        start = time.perf_counter()
+        taste, quality, dilution = edge_model.predict([payload[k] for k in FEATURE_KEYS])
+        timing["inference_ms"] = (time.perf_counter() - start) * 1000
+        print(f" Edge prediction ({timing['inference_ms']:.2f} ms): taste={taste} quality={quality} dilution={dilution}")
+        result = dict(payload)
+        result.update({
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "taste_sweet": taste[0], "taste_salty": taste[1], "taste_bitter": taste[2],
+            "taste_sour": taste[3], "taste_umami": taste[4],
+            "quality": quality, "dilution": dilution,
+            "model_version": edge_model.version,
+        })
+        result_uploader.submit(result)
+        handle_status_reset_with_countdown()
+        return
+
+    if prediction_stream is not None:
+        try:
+            print(" Sending reading over the prediction stream...")
+            print(" Prediction:", prediction_stream.predict(payload))
+            handle_status_reset_with_countdown()
+            return
+        except Exception as e:
+            print(f" Prediction stream error, falling back to HTTP: {e}")
+
+    try:
+        url = f"{BASE_URL}/predict/{FACTORY_MEDICINE_ID}"
+        print(" Sending data to API for prediction...")
+        res = SESSION.post(url, json=payload, timeout=10)
+        if res.status_code == 200:
+            print(" Predict POST successful:", res.json())
+        elif res.status_code >= 500:
+            print(f" Predict POST failed: {res.status_code} {res.text}")
+            reading_queue.put("predict", payload)
+        else:
+            print(f" Predict POST failed: {res.status_code} {res.text}")
+    except requests.exceptions.RequestException as e:
+        print(f" API connection error: {e}")
+        reading_queue.put("predict", payload)
+
+    handle_status_reset_with_countdown()
+
+def check_for_update():
+    """Download the agent again only if the server's copy hash differs, then restart."""
+    try:
+        with open(__file__, "rb") as f:
+            etag = '"' + hashlib.sha256(f.read()).hexdigest() + '"'
+        url = f"{BASE_URL}/shell/{FACTORY_MEDICINE_ID}/agent.py"
+        res = SESSION.get(url, headers={"If-None-Match": etag}, timeout=10)
+        if res.status_code == 304:
+            return
+        if res.status_code != 200:
+            print(f" Update check failed: {res.status_code}")
+            return
+        print(f" New agent version {res.headers.get('X-Agent-Version')} available. Updating...")
+        tmp_path = __file__ + ".new"
+        with open(tmp_path, "wb") as f:
+            f.write(res.content)
+        os.replace(tmp_path, __file__)
+        GPIO.cleanup()
+        os.execv(sys.executable, [sys.executable, __file__])
+    except (requests.exceptions.RequestException, OSError) as e:
+        print(f" Update check error: {e}")
+
+def poll_picron():
+    last_update_check = time.time()
+    last_model_check = time.time()
+    while True:
+        if time.time() - last_update_check > UPDATE_CHECK_INTERVAL:
+            last_update_check = time.time()
+            check_for_update()
+        if EDGE_INFERENCE and time.time() - last_model_check > MODEL_CHECK_INTERVAL:
+            last_model_check = time.time()
+            refresh_edge_model()
+        try:
+            url = f"{BASE_URL}/picron/{FACTORY_MEDICINE_ID}"
+            res = SESSION.get(url, timeout=5)
+            
+            if res.status_code == 200:
+                reading_queue.flush()
+                data = res.json().get("data", [])
+                if not data:
+                    print(f" No picron row found for {FACTORY_MEDICINE_ID}")
+                else:
+                    row = data[0]
+                    status = row.get("status", 0)
+                    if status == 1:
+                        handle_dataset_flow(row)
+                    elif status == 2:
+                        handle_predict_flow()
+                    else:
+                        print(f" Waiting... current status is {status}.")
+            else:
+                print(f" Failed to fetch picron: {res.text}")
+        except requests.exceptions.RequestException as e:
+            print(f" API connection error while polling: {e}")
+        
+        time.sleep(5)
+
+if __name__ == "__main__":
+    check_for_update()
+    try:
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setup(IR_SENSOR_PIN, GPIO.IN)
+        GPIO.setup(ACCESS_DOOR_PIN, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+
+        try:
+            i2c_ads = busio.I2C(board.SCL, board.SDA)
+            ads = ADS.ADS1115(i2c_ads)
+            ads.gain = 1
+            alcohol_chan = AnalogIn(ads, ADS.P0)
+            alcohol_sensor_available = True
+            print(" Alcohol sensor initialized.")
+        except Exception as e:
+            print(f" Failed to initialize alcohol sensor: {e}")
+            alcohol_sensor_available = False
+
+        try:
+            sensor = AS726X()
+            if sensor.begin():
+                print(" AS7263 sensor initialized.")
+            else:
+                raise RuntimeError("Failed to begin AS7263 sensor.")
+        except Exception as e:
+            print(f" CRITICAL: Could not initialize AS7263 sensor: {e}. Exiting.")
+            sys.exit(1)
+
+        reading_queue = ReadingQueue()
+        if reading_queue.size():
+            print(f" {reading_queue.size()} readings queued from a previous run.")
+
+        edge_model = None
+        if EDGE_INFERENCE:
+            load_edge_model()
+            refresh_edge_model()
+            result_uploader = ResultUploader()
+
+        prediction_stream = PredictionStream() if USE_WEBSOCKET else None
+
+        print("\n--- System Ready ---")
+        poll_picron()
+
+    except KeyboardInterrupt:
+        print("\nProgram terminated by user.")
+    finally:
+        GPIO.cleanup()
+        print("GPIO cleaned up. Exiting.")
@@ -0,0 +1,150 @@
+"""
+Admission control for CPU-heavy routes.
+
+Each heavy route belongs to a lane with a concurrency limit and a bounded
+wait queue. A request that finds its lane busy waits in the queue (up to the
+lane's queue timeout); when the queue is already full it is rejected at once
+with 503 and a Retry-After header instead of piling onto the threadpool.
+
+    lane      routes                       default limit / queue / timeout
+    predict   POST /predict/{id}           16 / 64 / 5s
+    train     POST /train/{id}             1  / 2  / 120s
+
+The priority lane (health, readiness, metrics, Picron polling and live-sensor
+traffic) is never queued or rejected. The heavy limits stay well below the
+threadpool size (40), so sync handlers on the priority lane always find a
+free thread even while trainings run. Routes not listed are not limited.
+
+Env: PREDICT_CONCURRENCY, PREDICT_QUEUE, PREDICT_QUEUE_TIMEOUT, and the same
+for TRAIN_*. ADMISSION_CONTROL=0 disables the middleware.
+"""
+import asyncio
+import json
+import logging
+import os
+
+from app.utils.metrics import metrics, match_route
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "1") == "1"
+
+# Path prefixes that bypass admission control entirely
+PRIORITY_PREFIXES = ("/health", "/ready", "/metrics", "/picron", "/livesensor")
+
+metrics.describe("admission_requests_total", "Requests on limited lanes by outcome (admitted, queued, rejected, timeout).")
+
+
+def _env(name: str, default):
+    return type(default)(os.getenv(name, str(default)))
+
+
+class Lane:
+    """Concurrency limit plus bounded FIFO wait queue for one class of routes."""
+
+    def __init__(self, name: str, limit: int, queue: int, queue_timeout: float, retry_after: int):
+        self.name = name
+        self.limit = max(1, limit)
+        self.queue = max(0, queue)
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._semaphore = asyncio.Semaphore(self.limit)
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    async def acquire(self) -> bool:
+        """Take a slot, waiting in the queue if needed. False means reject the request."""
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+            outcome = "admitted"
+        elif self.waiting >= self.queue:
+            self.rejected += 1
+            metrics.inc("admission_requests_total", lane=self.name, outcome="rejected")
+            return False
+        else:
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                metrics.inc("admission_requests_total", lane=self.name, outcome="timeout")
+                return False
+            finally:
+                self.waiting -= 1
+            outcome = "queued"
+        self.active += 1
+        metrics.inc("admission_requests_total", lane=self.name, outcome=outcome)
+        return True
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queue_depth": self.waiting,
+            "queue_size": self.queue,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+        }
+
+
+lanes = {
+    "predict": Lane("predict", _env("PREDICT_CONCURRENCY", 16), _env("PREDICT_QUEUE", 64),
+                    _env("PREDICT_QUEUE_TIMEOUT", 5.0), retry_after=1),
+    "train": Lane("train", _env("TRAIN_CONCURRENCY", 1), _env("TRAIN_QUEUE", 2),
+                  _env("TRAIN_QUEUE_TIMEOUT", 120.0), retry_after=30),
+}
+
+# (method, route template) -> lane
+ROUTE_LANES = {
+    ("POST", "/predict/{factory_medicine_id}"): "predict",
+    ("POST", "/train/{factory_medicine_id}"): "train",
+}
+
+
+def stats() -> dict:
+    return {name: lane.stats() for name, lane in lanes.items()}
+
+
+async def _reject(send, lane: Lane):
+    body = json.dumps({"detail": f"Server busy ({lane.name}); retry later"}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 503,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(lane.retry_after).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """ASGI middleware: limit, queue or reject requests on the heavy lanes."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ADMISSION_CONTROL or scope["path"].startswith(PRIORITY_PREFIXES):
+            return await self.app(scope, receive, send)
+
+        route, _ = match_route(scope)
+        lane_name = ROUTE_LANES.get((scope["method"], route))
+        if lane_name is None:
+            return await self.app(scope, receive, send)
+
+        lane = lanes[lane_name]
+        if not await lane.acquire():
+            logger.debug("Rejected %s %s: %s lane full", scope["method"], scope["path"], lane.name)
+            return await _reject(send, lane)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            lane.release()
@@ -0,0 +1,105 @@
+"""
+Fake Telegram Bot API for offline runs and benchmarks.
+
+An httpx transport that answers sendMessage and getUpdates in-process.
+Enabled with TELEGRAM_BACKEND=fake; FAKE_TELEGRAM_LATENCY (seconds) and
+FAKE_TELEGRAM_429_RATE (0..1) simulate a slow or rate-limiting API.
+"""
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import httpx
+
+LATENCY = float(os.getenv("FAKE_TELEGRAM_LATENCY", "0"))
+RATE_LIMIT_PROBABILITY = float(os.getenv("FAKE_TELEGRAM_429_RATE", "0"))
+
+
+class FakeTelegram:
+    def __init__(self, latency: float = LATENCY, rate_limit_probability: float = RATE_LIMIT_PROBABILITY):
+        self.latency = latency
+        self.rate_limit_probability = rate_limit_probability
+        self.sent = deque(maxlen=10000)
+        self._updates = []
+        self._next_update_id = 1
+        self._lock = threading.Lock()
+
+    def push_message(self, chat_id, text: str):
+        """Queue an incoming user message for getUpdates (e.g. a registration code)."""
+        with self._lock:
+            self._updates.append({
+                "update_id": self._next_update_id,
+                "message": {"chat": {"id": chat_id}, "text": text, "date": int(time.time())},
+            })
+            self._next_update_id += 1
+
+    def _respond(self, request: httpx.Request, method: str, final: bool):
+        """Response to a Bot API call; None while a getUpdates long poll should keep waiting."""
+        if method == "sendMessage":
+            if self.rate_limit_probability and random.random() < self.rate_limit_probability:
+                return httpx.Response(429, json={"ok": False, "error_code": 429, "parameters": {"retry_after": 1}})
+            payload = json.loads(request.content)
+            self.sent.append(payload)
+            return httpx.Response(200, json={"ok": True, "result": {"message_id": len(self.sent), "chat": {"id": payload["chat_id"]}}})
+
+        if method == "getUpdates":
+            offset = int(request.url.params.get("offset", 0) or 0)
+            with self._lock:
+                self._updates = [u for u in self._updates if u["update_id"] >= offset]
+                result = list(self._updates)
+            if result or final:
+                return httpx.Response(200, json={"ok": True, "result": result})
+            return None
+
+        return httpx.Response(404, json={"ok": False, "description": f"Unknown method {method}"})
+
+    @staticmethod
+    def _poll_deadline(request: httpx.Request) -> float:
+        timeout = min(float(request.url.params.get("timeout", 0) or 0), 1.0)
+        return time.monotonic() + timeout
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        """Sync clients (the getUpdates consumer thread)."""
+        method = request.url.path.rsplit("/", 1)[-1]
+        if self.latency:
+            time.sleep(self.latency)
+        deadline = self._poll_deadline(request)
+        while True:
+            response = self._respond(request, method, time.monotonic() >= deadline)
+            if response is not None:
+                return response
+            time.sleep(0.05)
+
+    async def handle_async(self, request: httpx.Request) -> httpx.Response:
+        """Async clients (the dispatcher): simulated latency must not block the event loop."""
+        method = request.url.path.rsplit("/", 1)[-1]
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        deadline = self._poll_deadline(request)
+        while True:
+            response = self._respond(request, method, time.monotonic() >= deadline)
+            if response is not None:
+                return response
+            await asyncio.sleep(0.05)
+
+    def transport(self) -> httpx.MockTransport:
+        return _Transport(self)
+
+
+class _Transport(httpx.MockTransport):
+    """MockTransport that sleeps with asyncio when used by an AsyncClient."""
+
+    def __init__(self, fake: FakeTelegram):
+        super().__init__(fake.handle)
+        self._fake = fake
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        return await self._fake.handle_async(request)
+
+
+fake_telegram = FakeTelegram()
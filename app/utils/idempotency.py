@@ -0,0 +1,178 @@
+"""
+Idempotency keys for device writes (POST /data/, POST /predict/{id}).
+
+A request carrying an `Idempotency-Key` header (or a client-generated
+reading_id) is recorded here once it succeeds. A retry with the same key
+gets the stored response back without running inference, database writes
+or Telegram notifications again; a retry that arrives while the original is
+still running gets 409 with Retry-After.
+
+Keys are kept as 64-bit hashes (blake2b of route scope + key) in two
+open-addressing tables of unsigned 64-bit ints, 16 bytes per key: a key
+costs the same whatever its length, and IDEMPOTENCY_MAX_KEYS (default 1M)
+keys take ~16 MB. New keys go into the current table; when it is half full
+or IDEMPOTENCY_TTL seconds old it becomes the previous table and the old
+previous one is dropped, so a key is remembered for at least the TTL
+unless the key volume fills the tables first. Full responses are kept for
+the most recent IDEMPOTENCY_RESPONSES keys only; an older duplicate is still
+recognised and answered with a short "duplicate" body.
+
+The store is per process; with several workers, the unique reading_id
+indexes on sensor_data and predicted_data (migrations/) still catch retries
+that land on another worker.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "1000000"))
+IDEMPOTENCY_RESPONSES = int(os.getenv("IDEMPOTENCY_RESPONSES", "10000"))
+
+# begin() outcomes
+NEW = "new"
+REPLAY = "replay"
+IN_PROGRESS = "in_progress"
+
+
+def key_hash(scope: str, key: str) -> int:
+    """Non-zero 64-bit hash of a key within its route scope (0 marks an empty slot)."""
+    digest = hashlib.blake2b(f"{scope}\x00{key}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+class KeyTable:
+    """Fixed-size set of 64-bit hashes (linear probing in an array('Q'))."""
+
+    def __init__(self, capacity: int):
+        size = 1
+        while size < capacity * 2:   # keep the load factor at or below 1/2
+            size <<= 1
+        self.capacity = capacity
+        self.mask = size - 1
+        self.slots = array("Q", bytes(8 * size))
+        self.count = 0
+        self.created = time.monotonic()
+
+    def _slot(self, h: int) -> int:
+        i = h & self.mask
+        slots = self.slots
+        while slots[i] and slots[i] != h:
+            i = (i + 1) & self.mask
+        return i
+
+    def __contains__(self, h: int) -> bool:
+        return self.slots[self._slot(h)] == h
+
+    def add(self, h: int):
+        i = self._slot(h)
+        if not self.slots[i]:
+            self.slots[i] = h
+            self.count += 1
+
+    def full(self) -> bool:
+        return self.count >= self.capacity
+
+
+class IdempotencyStore:
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL, max_keys: int = IDEMPOTENCY_MAX_KEYS,
+                 max_responses: int = IDEMPOTENCY_RESPONSES):
+        self.ttl = ttl
+        self.generation_size = max(1, max_keys // 2)
+        self.max_responses = max_responses
+        self._lock = threading.Lock()
+        self._current = None    # allocated on first use
+        self._previous = None
+        self._responses = OrderedDict()   # hash -> (stored_at, response)
+        self._in_flight = set()
+        self.replays = 0
+        self.conflicts = 0
+        self.rotations = 0
+
+    def _rotate_if_needed(self):
+        if self._current is None:
+            self._current = KeyTable(self.generation_size)
+        elif self._current.full() or time.monotonic() - self._current.created >= self.ttl:
+            self._previous, self._current = self._current, KeyTable(self.generation_size)
+            self.rotations += 1
+
+    def _seen(self, h: int) -> bool:
+        if self._current is None:
+            return False
+        if h in self._current:
+            return True
+        return self._previous is not None and h in self._previous \
+            and time.monotonic() - self._previous.created < 2 * self.ttl
+
+    def begin(self, scope: str, key: str):
+        """(NEW | REPLAY | IN_PROGRESS, stored response or None) for a request key."""
+        h = key_hash(scope, key)
+        with self._lock:
+            if h in self._in_flight:
+                self.conflicts += 1
+                return IN_PROGRESS, None
+            if self._seen(h):
+                self.replays += 1
+                entry = self._responses.get(h)
+                if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                    return REPLAY, entry[1]
+                return REPLAY, None
+            self._in_flight.add(h)
+        return NEW, None
+
+    def complete(self, scope: str, key: str, response):
+        """Remember a successful response for `key`."""
+        h = key_hash(scope, key)
+        with self._lock:
+            self._in_flight.discard(h)
+            self._rotate_if_needed()
+            self._current.add(h)
+            self._responses[h] = (time.monotonic(), response)
+            self._responses.move_to_end(h)
+            while len(self._responses) > self.max_responses:
+                self._responses.popitem(last=False)
+
+    def release(self, scope: str, key: str):
+        """Forget an in-flight key whose request failed, so a retry runs again."""
+        with self._lock:
+            self._in_flight.discard(key_hash(scope, key))
+
+    def stats(self) -> dict:
+        with self._lock:
+            keys = sum(t.count for t in (self._current, self._previous) if t is not None)
+            return {
+                "keys": keys,
+                "responses": len(self._responses),
+                "in_flight": len(self._in_flight),
+                "replays": self.replays,
+                "conflicts": self.conflicts,
+                "rotations": self.rotations,
+            }
+
+
+idempotency = IdempotencyStore()
+
+
+# ---------------- route helpers ----------------
+def request_key(request, reading_id: str = None):
+    """The request's Idempotency-Key header, else the client's reading_id (None if neither)."""
+    return request.headers.get("idempotency-key") or reading_id
+
+
+def replay_response(outcome: str, response):
+    """Answer for a key that begin() did not return NEW for: the stored body, or 409 while it still runs."""
+    if outcome == IN_PROGRESS:
+        raise HTTPException(status_code=409, detail="A request with this idempotency key is in progress",
+                            headers={"Retry-After": "1"})
+    if response is None:
+        response = {"status": "success", "duplicate": True}
+    return JSONResponse(response, headers={"Idempotent-Replayed": "true"})
@@ -0,0 +1,175 @@
+"""
+Inference executor: sklearn transform/predict in dedicated worker processes.
+
+CPU-bound inference would otherwise hold the GIL inside Starlette's request
+threadpool and slow down the I/O-bound routes. Each worker process is capped
+to INFERENCE_THREADS BLAS/OpenMP threads (threadpoolctl) and keeps the
+models it has used resident, reloading a factory only when its
+model_version changes. Requests carry the factory, its current version and
+the input rows; the worker returns plain lists plus per-stage timings.
+
+INFERENCE_WORKERS=0 runs inference in the calling thread instead, on the
+models in model_cache. app/server.py defaults to 0 so its forked workers
+predict from the models warmed in the parent; with INFERENCE_WORKERS > 0
+every HTTP worker owns its own pool, so the process count is
+workers x INFERENCE_WORKERS, each with a private copy of the models.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from starlette.concurrency import run_in_threadpool
+
+from app.utils.model_cache import model_cache, model_paths, model_version, load_from_paths, trained_factories
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", "1"))
+
+# ---------------- worker process side ----------------
+_worker_models = {}   # factory -> (version, models)
+_thread_limits = None
+
+
+def _init_worker(threads: int, preload: dict):
+    """Pin BLAS/OpenMP threads before numpy loads, then load the given factories."""
+    global _thread_limits
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    from threadpoolctl import threadpool_limits
+    _thread_limits = threadpool_limits(limits=threads)
+
+    for factory, (version, paths) in preload.items():
+        try:
+            _worker_models[factory] = (version, load_from_paths(paths))
+        except Exception:
+            pass  # loaded again (with a proper error) on first request
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def run_models(models: dict, rows: list) -> dict:
+    """Scale `rows` and run the three models. Returns plain lists and stage timings (s)."""
+    import numpy as np
+
+    t0 = time.perf_counter()
+    X_scaled = models["scaler"].transform(np.asarray(rows, dtype=float))
+    t1 = time.perf_counter()
+    taste = models["taste"].predict(X_scaled)
+    quality = np.ravel(models["quality"].predict(X_scaled))
+    dilution = np.ravel(models["dilution"].predict(X_scaled))
+    t2 = time.perf_counter()
+    return {
+        "taste": taste.tolist(),
+        "quality": quality.tolist(),
+        "dilution": dilution.tolist(),
+        "timings": {"transform": t1 - t0, "predict": t2 - t1},
+    }
+
+
+def _predict_task(factory: str, version: str, paths: dict, rows: list) -> dict:
+    start = time.perf_counter()
+    cached = _worker_models.get(factory)
+    if cached is None or cached[0] != version:
+        cached = _worker_models[factory] = (version, load_from_paths(paths))
+    load_seconds = time.perf_counter() - start
+    result = run_models(cached[1], rows)
+    result["timings"]["load_models"] = load_seconds
+    return result
+
+
+# ---------------- API process side ----------------
+class InferencePool:
+    def __init__(self, workers: int = INFERENCE_WORKERS, threads: int = INFERENCE_THREADS):
+        self.workers = workers
+        self.threads = threads
+        self._executor = None
+        self._lock = threading.Lock()
+        self._warmup = []
+        self.restarts = 0
+
+    def start(self):
+        """Create the worker processes, preloading every trained factory's models."""
+        if self.workers <= 0 or self._executor is not None:
+            return
+        preload = {}
+        for factory in trained_factories():
+            try:
+                preload[factory] = (model_version(factory), model_paths(factory))
+            except FileNotFoundError:
+                continue
+        # spawn, not fork: the API process already runs threads (event loop, outbox, logging)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.threads, preload),
+        )
+        # processes are spawned on demand; one task each starts (and preloads) them all now
+        self._warmup = [self._executor.submit(_ping) for _ in range(self.workers)]
+        logger.info("Inference pool started: %d processes x %d threads", self.workers, self.threads)
+
+    @property
+    def ready(self) -> bool:
+        """True once every worker process has started and preloaded its models."""
+        return all(f.done() for f in self._warmup)
+
+    def stop(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _restart(self, broken):
+        with self._lock:
+            if self._executor is not broken:
+                return  # another request already replaced it
+            self._executor = None
+            self.restarts += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+        logger.warning("Inference pool broke; restarting")
+        self.start()
+
+    def predict_sync(self, factory_medicine_id: str, rows: list) -> dict:
+        """Run inference in the calling thread (pool disabled, or callers already off the event loop)."""
+        start = time.perf_counter()
+        models = model_cache.get(factory_medicine_id)
+        load_seconds = time.perf_counter() - start
+        result = run_models(models, rows)
+        result["timings"]["load_models"] = load_seconds
+        return result
+
+    async def predict(self, factory_medicine_id: str, rows: list) -> dict:
+        """
+        Predictions for `rows` (lists of INPUT_COLS values) plus the model_version
+        used. Raises FileNotFoundError when the factory has no trained models.
+        """
+        version = model_version(factory_medicine_id)
+        loop = asyncio.get_running_loop()
+        executor = self._executor
+        if executor is None:
+            result = await run_in_threadpool(self.predict_sync, factory_medicine_id, rows)
+        else:
+            paths = model_paths(factory_medicine_id)
+            try:
+                result = await loop.run_in_executor(executor, _predict_task, factory_medicine_id, version, paths, rows)
+            except BrokenProcessPool:
+                self._restart(executor)
+                result = await loop.run_in_executor(
+                    self._executor, _predict_task, factory_medicine_id, version, paths, rows)
+        result["model_version"] = version
+        return result
+
+    def stats(self) -> dict:
+        return {"workers": self.workers if self._executor else 0, "threads": self.threads, "restarts": self.restarts}
+
+
+inference_pool = InferencePool()
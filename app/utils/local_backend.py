@@ -0,0 +1,211 @@
+"""
+In-process stand-in for the Supabase client, backed by SQLite.
+
+Implements the part of the supabase-py API this app uses (table queries
+with select/eq/gt/order/limit/range, insert, upsert, and the storage
+bucket calls in trainer.upload_model) so the API can run and be benchmarked
+without a Supabase project. Enable with STORAGE_BACKEND=local; rows live in
+LOCAL_DB_PATH (default: in memory).
+"""
+import json
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+
+# Tables created up front; any other name is created on first use
+TABLES = ["sensor_data", "predicted_data", "picron_data", "live_sensor", "telegram_factory_map"]
+
+# Unique columns, as created by migrations/ on Supabase
+UNIQUE_COLUMNS = {"sensor_data": ["reading_id"], "predicted_data": ["reading_id"]}
+
+
+@dataclass
+class APIResponse:
+    data: list = field(default_factory=list)
+    count: int = None
+
+
+class QueryBuilder:
+    def __init__(self, client, table: str):
+        self._client = client
+        self._table = table
+        self._columns = None
+        self._filters = []
+        self._order = None
+        self._limit = None
+        self._offset = 0
+        self._write = None
+
+    # ---------------- reads ----------------
+    def select(self, columns: str = "*", count=None):
+        if columns.strip() != "*":
+            self._columns = [c.strip() for c in columns.split(",")]
+        return self
+
+    def eq(self, column: str, value):
+        self._filters.append((column, "=", value))
+        return self
+
+    def gt(self, column: str, value):
+        self._filters.append((column, ">", value))
+        return self
+
+    def order(self, column: str, desc: bool = False):
+        self._order = (column, desc)
+        return self
+
+    def limit(self, size: int):
+        self._limit = size
+        return self
+
+    def range(self, start: int, end: int):
+        self._offset = start
+        self._limit = end - start + 1
+        return self
+
+    # ---------------- writes ----------------
+    def insert(self, json_data, **kwargs):
+        self._write = ("insert", json_data if isinstance(json_data, list) else [json_data], None, False)
+        return self
+
+    def upsert(self, json_data, on_conflict: str = "", ignore_duplicates: bool = False, **kwargs):
+        rows = json_data if isinstance(json_data, list) else [json_data]
+        self._write = ("upsert", rows, on_conflict or "id", ignore_duplicates)
+        return self
+
+    def execute(self) -> APIResponse:
+        if self._write is not None:
+            return APIResponse(self._client._write(self._table, *self._write))
+        return APIResponse(self._client._select(self))
+
+
+class BucketProxy:
+    def __init__(self, client, bucket: str):
+        self._client = client
+        self._bucket = bucket
+
+    def upload(self, path: str, file: bytes, file_options=None):
+        return self._client._upload(self._bucket, path, file)
+
+    def remove(self, paths: list):
+        return self._client._remove(self._bucket, paths)
+
+    def get_public_url(self, path: str):
+        return f"local://{self._bucket}/{path}"
+
+    def download(self, path: str) -> bytes:
+        return self._client._download(self._bucket, path)
+
+
+class StorageProxy:
+    def __init__(self, client):
+        self._client = client
+
+    def from_(self, bucket: str) -> BucketProxy:
+        return BucketProxy(self._client, bucket)
+
+
+class LocalClient:
+    """SQLite-backed drop-in for supabase.Client (tables + storage buckets)."""
+
+    def __init__(self, path: str = ":memory:"):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.Lock()
+        self._tables = set(TABLES)
+        for table in TABLES:
+            self._ensure_table(table)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS storage_objects (bucket TEXT, path TEXT, data BLOB, PRIMARY KEY (bucket, path))"
+        )
+        self.storage = StorageProxy(self)
+
+    def _ensure_table(self, table: str):
+        self._conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" (id INTEGER PRIMARY KEY AUTOINCREMENT, data TEXT NOT NULL)')
+        for column in UNIQUE_COLUMNS.get(table, []):
+            self._conn.execute(
+                f'CREATE UNIQUE INDEX IF NOT EXISTS "{table}_{column}_key" ON "{table}" ({self._column(column)})'
+            )
+
+    def table(self, name: str) -> QueryBuilder:
+        if name not in self._tables:
+            with self._lock:
+                self._ensure_table(name)
+                self._tables.add(name)
+        return QueryBuilder(self, name)
+
+    # ---------------- query execution ----------------
+    @staticmethod
+    def _column(name: str) -> str:
+        return "id" if name == "id" else f"json_extract(data, '$.{name}')"
+
+    @staticmethod
+    def _row(row_id: int, data: str) -> dict:
+        return {"id": row_id, **json.loads(data)}
+
+    def _select(self, q: QueryBuilder) -> list:
+        sql = f'SELECT id, data FROM "{q._table}"'
+        params = []
+        if q._filters:
+            sql += " WHERE " + " AND ".join(f"{self._column(c)} {op} ?" for c, op, _ in q._filters)
+            params += [v for _, _, v in q._filters]
+        if q._order:
+            sql += f" ORDER BY {self._column(q._order[0])} {'DESC' if q._order[1] else 'ASC'}, id {'DESC' if q._order[1] else 'ASC'}"
+        if q._limit is not None or q._offset:
+            sql += " LIMIT ? OFFSET ?"
+            params += [q._limit if q._limit is not None else -1, q._offset]
+        with self._lock:
+            rows = [self._row(*r) for r in self._conn.execute(sql, params)]
+        if q._columns:
+            rows = [{c: r.get(c) for c in q._columns} for r in rows]
+        return rows
+
+    def _write(self, table: str, mode: str, rows: list, on_conflict: str, ignore_duplicates: bool) -> list:
+        out = []
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for row in rows:
+                    row = dict(row)
+                    existing = None
+                    if mode == "upsert" and row.get(on_conflict) is not None:
+                        existing = self._conn.execute(
+                            f'SELECT id, data FROM "{table}" WHERE {self._column(on_conflict)} = ?', (row[on_conflict],)
+                        ).fetchone()
+                    if existing is not None:
+                        if ignore_duplicates:
+                            continue
+                        merged = {**json.loads(existing[1]), **row}
+                        merged.pop("id", None)
+                        self._conn.execute(f'UPDATE "{table}" SET data = ? WHERE id = ?', (json.dumps(merged), existing[0]))
+                        out.append({"id": existing[0], **merged})
+                        continue
+                    row_id = row.pop("id", None)
+                    cur = self._conn.execute(f'INSERT INTO "{table}" (id, data) VALUES (?, ?)', (row_id, json.dumps(row)))
+                    out.append({"id": cur.lastrowid, **row})
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return out
+
+    # ---------------- storage ----------------
+    def _upload(self, bucket: str, path: str, data: bytes):
+        with self._lock:
+            try:
+                self._conn.execute("INSERT INTO storage_objects VALUES (?, ?, ?)", (bucket, path, data))
+            except sqlite3.IntegrityError:
+                raise Exception(f"The resource already exists: {bucket}/{path}")
+        return {"Key": f"{bucket}/{path}"}
+
+    def _remove(self, bucket: str, paths: list):
+        with self._lock:
+            self._conn.executemany("DELETE FROM storage_objects WHERE bucket = ? AND path = ?", [(bucket, p) for p in paths])
+        return [{"name": p} for p in paths]
+
+    def _download(self, bucket: str, path: str) -> bytes:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM storage_objects WHERE bucket = ? AND path = ?", (bucket, path)).fetchone()
+        if row is None:
+            raise Exception(f"Object not found: {bucket}/{path}")
+        return row[0]
@@ -0,0 +1,195 @@
+"""
+Structured, non-blocking logging for the API.
+
+Application loggers live under "app" (logging.getLogger(__name__) in every
+module). Records go through a QueueHandler so request threads never block on
+stdout; a QueueListener thread formats them as one JSON object per line
+(LOG_FORMAT=text for a human-readable console) and tags them with the
+current request id and factory id.
+
+RequestLoggingMiddleware assigns the request id (X-Request-ID, echoed back)
+and writes one access record per request with its duration. Access records
+for high-frequency routes are sampled: LOG_SAMPLE="GET /picron/{factory_medicine_id}=0.01,..."
+(errors are always logged). Levels and sample rates can be changed at
+runtime through /logging.
+"""
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from app.utils.metrics import match_route
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+# Device polling routes: a handful of access records per 100 requests is plenty
+DEFAULT_SAMPLE_RATES = {
+    "GET /picron/{factory_medicine_id}": 0.01,
+    "GET /livesensor/": 0.01,
+    "POST /livesensor/": 0.01,
+}
+
+request_id_var = contextvars.ContextVar("request_id", default=None)
+factory_id_var = contextvars.ContextVar("factory_id", default=None)
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def _parse_sample_rates(value: str) -> dict:
+    rates = {}
+    for item in filter(None, (s.strip() for s in value.split(","))):
+        route, _, rate = item.rpartition("=")
+        rates[route.strip()] = float(rate)
+    return rates
+
+
+class ContextFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        record.factory_id = factory_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class AccessSampler:
+    """Per-route sampling of access records; 4xx/5xx responses are always kept."""
+
+    def __init__(self, rates: dict):
+        self._rates = dict(rates)
+        self._lock = threading.Lock()
+
+    @property
+    def rates(self) -> dict:
+        return dict(self._rates)
+
+    def set_rate(self, route: str, rate: float):
+        if not 0 <= rate <= 1:
+            raise ValueError(f"Sample rate for {route!r} must be between 0 and 1")
+        with self._lock:
+            self._rates[route] = rate
+
+    def should_log(self, method: str, route: str, status: int) -> bool:
+        if status >= 400:
+            return True
+        rate = self._rates.get(f"{method} {route}", 1.0)
+        return rate >= 1 or random.random() < rate
+
+
+sampler = AccessSampler({**DEFAULT_SAMPLE_RATES, **_parse_sample_rates(os.getenv("LOG_SAMPLE", ""))})
+access_logger = logging.getLogger("app.access")
+
+_listener = None
+
+
+def setup_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT):
+    """Route the "app" logger tree through a background queue listener (idempotent)."""
+    global _listener
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stdout)
+    if fmt == "json":
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(name)s [%(request_id)s] %(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger("app")
+    root.handlers = [queue_handler]
+    root.setLevel(level)
+    root.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def set_level(level: str, logger_name: str = "app"):
+    level = level.upper()
+    if not isinstance(logging.getLevelName(level), int):
+        raise ValueError(f"Unknown log level: {level}")
+    logging.getLogger(logger_name).setLevel(level)
+
+
+def get_levels() -> dict:
+    """Effective level of "app" and every app logger with its own level set."""
+    levels = {"app": logging.getLevelName(logging.getLogger("app").getEffectiveLevel())}
+    for name, logger in logging.Logger.manager.loggerDict.items():
+        if name.startswith("app.") and isinstance(logger, logging.Logger) and logger.level:
+            levels[name] = logging.getLevelName(logger.level)
+    return levels
+
+
+class RequestLoggingMiddleware:
+    """ASGI middleware: request id / factory id context and sampled access records."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1")[:64] or uuid.uuid4().hex[:16]
+        route, params = match_route(scope)
+        factory_id = params.get("factory_medicine_id") or params.get("factory_medicine")
+        rid_token = request_id_var.set(request_id)
+        fid_token = factory_id_var.set(factory_id)
+        method = scope["method"]
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if sampler.should_log(method, route, status):
+                access_logger.log(
+                    logging.WARNING if status >= 500 else logging.INFO,
+                    "%s %s %s", method, scope["path"], status,
+                    extra={"method": method, "route": route, "status": status,
+                           "duration_ms": round((time.perf_counter() - start) * 1000, 2)},
+                )
+            request_id_var.reset(rid_token)
+            factory_id_var.reset(fid_token)
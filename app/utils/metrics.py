@@ -0,0 +1,206 @@
+"""
+In-process metrics with Prometheus text exposition.
+
+- MetricsMiddleware records per-route request latency histograms, request
+  counts by status, and in-flight gauges (route templates, not raw paths,
+  so label cardinality stays bounded).
+- `span(name)` times a named stage (load_models, insert, fit, ...).
+- `add_collector(prefix, fn)` folds an existing stats() dict into the output.
+
+Everything is plain counters behind one lock, cheap enough to leave on.
+"""
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from starlette.routing import Match
+
+# Seconds; covers cached GETs (ms) up to training runs (tens of seconds)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+logger = logging.getLogger(__name__)
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in labels) + "}"
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._help = {}
+        self._buckets = {}
+        self._collectors = []
+
+    def describe(self, name: str, text: str):
+        self._help[name] = text
+
+    def set_buckets(self, name: str, buckets: tuple):
+        """Histogram bounds for `name` (default LATENCY_BUCKETS); call before the first observe."""
+        self._buckets[name] = tuple(buckets)
+
+    # ---------------- recording ----------------
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def gauge_add(self, name: str, amount: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + amount
+
+    def gauge_set(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram(self._buckets.get(name, LATENCY_BUCKETS))
+            hist.observe(value)
+
+    @contextmanager
+    def span(self, name: str):
+        """Time the enclosed block into span_duration_seconds{span=name}."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("span_duration_seconds", time.perf_counter() - start, span=name)
+
+    def add_collector(self, prefix: str, fn):
+        """Expose the numeric leaves of fn()'s dict as gauges named prefix_key[_subkey]."""
+        self._collectors.append((prefix, fn))
+
+    # ---------------- exposition ----------------
+    def _header(self, lines: list, name: str, kind: str, seen: set):
+        if name in seen:
+            return
+        seen.add(name)
+        if name in self._help:
+            lines.append(f"# HELP {name} {self._help[name]}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    def render(self) -> str:
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            histograms = sorted(
+                (key, (list(h.counts), h.sum, h.count, h.buckets)) for key, h in self._histograms.items()
+            )
+
+        lines, seen = [], set()
+        for (name, labels), value in counters:
+            self._header(lines, name, "counter", seen)
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for (name, labels), value in gauges:
+            self._header(lines, name, "gauge", seen)
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for (name, labels), (counts, total, count, buckets) in histograms:
+            self._header(lines, name, "histogram", seen)
+            cumulative = 0
+            for bound, n in zip(buckets, counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_labels(labels)} {total}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+
+        for prefix, fn in self._collectors:
+            try:
+                stats = fn()
+            except Exception as e:
+                logger.warning("Metrics collector %s failed: %s", prefix, e)
+                continue
+            for name, value in self._flatten(prefix, stats):
+                self._header(lines, name, "gauge", seen)
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    @classmethod
+    def _flatten(cls, prefix: str, stats: dict):
+        for key, value in stats.items():
+            name = f"{prefix}_{key}"
+            if isinstance(value, dict):
+                yield from cls._flatten(name, value)
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                yield name, value
+
+
+metrics = Metrics()
+metrics.describe("http_requests_total", "Requests by route template and status code.")
+metrics.describe("http_request_duration_seconds", "Request latency by route template.")
+metrics.describe("http_requests_in_flight", "Requests currently being handled.")
+metrics.describe("span_duration_seconds", "Duration of named processing stages.")
+
+span = metrics.span
+
+
+def match_route(scope) -> tuple:
+    """(route template, path params) for a request, resolved once and kept on the scope."""
+    if "matched_route" not in scope:
+        scope["matched_route"] = ("unmatched", {})
+        for route in scope["app"].router.routes:
+            match, child_scope = route.matches(scope)
+            if match == Match.FULL:
+                scope["matched_route"] = (route.path, child_scope.get("path_params", {}))
+                break
+    return scope["matched_route"]
+
+
+class MetricsMiddleware:
+    """ASGI middleware: latency histogram, status counts and in-flight gauge per route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        route, _ = match_route(scope)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        metrics.gauge_add("http_requests_in_flight", 1, method=method, route=route)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.observe("http_request_duration_seconds", time.perf_counter() - start, method=method, route=route)
+            metrics.inc("http_requests_total", method=method, route=route, status=status)
+            metrics.gauge_add("http_requests_in_flight", -1, method=method, route=route)
@@ -0,0 +1,131 @@
+import glob
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+MODELS_DIR = "app/models"
+MODEL_KINDS = ("scaler", "taste", "quality", "dilution")
+
+# Comma-separated factories to warm at startup; default: every factory with models on disk
+PRELOAD_FACTORIES = os.getenv("PRELOAD_FACTORIES", "")
+
+
+def model_paths(factory_medicine_id: str) -> dict:
+    return {kind: os.path.join(MODELS_DIR, f"{factory_medicine_id}_{kind}.pkl") for kind in MODEL_KINDS}
+
+
+def model_version(factory_medicine_id: str) -> str:
+    """Version tag of the model files on disk; changes whenever /train rewrites them."""
+    digest = hashlib.sha1()
+    for key, p in model_paths(factory_medicine_id).items():
+        if not os.path.exists(p):
+            raise FileNotFoundError(f"Model file not found: {p}. Please run /train/{factory_medicine_id} first.")
+        st = os.stat(p)
+        digest.update(f"{key}:{st.st_mtime_ns}:{st.st_size};".encode())
+    return f"{factory_medicine_id}_{digest.hexdigest()[:12]}"
+
+
+def load_from_paths(paths: dict) -> dict:
+    models = {}
+    for key, p in paths.items():
+        with open(p, "rb") as f:
+            models[key] = pickle.load(f)
+    return models
+
+
+def read_models(factory_medicine_id: str) -> dict:
+    """Unpickle scaler and models from MODELS_DIR. Raises FileNotFoundError if missing."""
+    paths = model_paths(factory_medicine_id)
+    for p in paths.values():
+        if not os.path.exists(p):
+            raise FileNotFoundError(f"Model file not found: {p}. Please run /train/{factory_medicine_id} first.")
+    return load_from_paths(paths)
+
+
+def trained_factories() -> list:
+    """Factories with a complete set of model files on disk."""
+    factories = []
+    for path in sorted(glob.glob(os.path.join(MODELS_DIR, "*_scaler.pkl"))):
+        factory = os.path.basename(path)[:-len("_scaler.pkl")]
+        if all(os.path.exists(p) for p in model_paths(factory).values()):
+            factories.append(factory)
+    return factories
+
+
+def warm_predict(models: dict):
+    """One synthetic prediction per model (the training mean as input) to fault in code and caches."""
+    import numpy as np
+
+    X = np.asarray(models["scaler"].mean_, dtype=float).reshape(1, -1)
+    X_scaled = models["scaler"].transform(X)
+    for kind in ("taste", "quality", "dilution"):
+        models[kind].predict(X_scaled)
+
+
+class ModelCache:
+    """
+    Loaded models per factory, keyed by model_version so a re-train (new
+    files on disk) is picked up on the next request. Checking the version is
+    four os.stat calls; the pickles are only read when it changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models = {}   # factory -> (version, models)
+        self.hits = 0
+        self.loads = 0
+        self.ready = False
+        self.warmed = []
+        self.warm_seconds = None
+
+    def get(self, factory_medicine_id: str) -> dict:
+        version = model_version(factory_medicine_id)
+        cached = self._models.get(factory_medicine_id)
+        if cached is not None and cached[0] == version:
+            self.hits += 1
+            return cached[1]
+
+        models = read_models(factory_medicine_id)
+        with self._lock:
+            self._models[factory_medicine_id] = (version, models)
+            self.loads += 1
+        return models
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+    def warm(self, factories=None) -> list:
+        """Load and warm the given (default: configured or all trained) factories, then mark ready."""
+        start = time.perf_counter()
+        if factories is None:
+            factories = [f for f in PRELOAD_FACTORIES.split(",") if f] or trained_factories()
+        warmed = []
+        for factory in factories:
+            try:
+                warm_predict(self.get(factory))
+                warmed.append(factory)
+            except Exception as e:
+                logger.warning("Could not warm models for %s: %s", factory, e)
+        self.warmed = warmed
+        self.warm_seconds = round(time.perf_counter() - start, 3)
+        self.ready = True
+        logger.info("Warmed models for %d factories in %.2fs", len(warmed), self.warm_seconds)
+        return warmed
+
+    def stats(self) -> dict:
+        return {
+            "factories": len(self._models),
+            "hits": self.hits,
+            "loads": self.loads,
+            "ready": int(self.ready),
+            "warm_seconds": self.warm_seconds,
+        }
+
+
+model_cache = ModelCache()
@@ -0,0 +1,56 @@
+# Bump when the exported layout changes so old agents can refuse it
+EXPORT_FORMAT = 1
+
+
+def _export_scaler(scaler) -> dict:
+    return {
+        "mean": scaler.mean_.tolist(),
+        "scale": scaler.scale_.tolist(),
+    }
+
+
+def _export_svr(svr) -> dict:
+    """Plain-array form of a fitted RBF SVR: f(x) = sum(dual_coef * exp(-gamma * |sv - x|^2)) + intercept."""
+    import numpy as np
+
+    if svr.kernel != "rbf":
+        raise ValueError(f"Only RBF SVR models can be exported (got kernel={svr.kernel!r})")
+    return {
+        "support_vectors": svr.support_vectors_.tolist(),
+        "dual_coef": svr.dual_coef_.ravel().tolist(),
+        "intercept": float(np.ravel(svr.intercept_)[0]),
+        "gamma": float(svr._gamma),
+    }
+
+
+def export_models(models: dict, version: str) -> dict:
+    """
+    Dependency-free export of a factory's scaler and SVR models (as returned
+    by load_models) for the device-side numpy evaluator.
+    """
+    return {
+        "format": EXPORT_FORMAT,
+        "model_version": version,
+        "scaler": _export_scaler(models["scaler"]),
+        "taste": [_export_svr(est) for est in models["taste"].estimators_],
+        "quality": _export_svr(models["quality"]),
+        "dilution": _export_svr(models["dilution"]),
+    }
+
+
+def evaluate_export(export: dict, X) -> dict:
+    """Reference evaluator for an export; mirrors the one embedded in the Picron agent."""
+    import numpy as np
+
+    x = (np.asarray(X, dtype=float) - export["scaler"]["mean"]) / export["scaler"]["scale"]
+
+    def svr(m):
+        sv = np.asarray(m["support_vectors"], dtype=float).reshape(-1, x.shape[1])
+        d2 = ((x[:, None, :] - sv[None, :, :]) ** 2).sum(axis=2)
+        return np.exp(-m["gamma"] * d2) @ np.asarray(m["dual_coef"]) + m["intercept"]
+
+    return {
+        "taste": np.stack([svr(m) for m in export["taste"]], axis=1),
+        "quality": svr(export["quality"]),
+        "dilution": svr(export["dilution"]),
+    }
@@ -0,0 +1,142 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from app.utils.notification_outbox import outbox
+
+logger = logging.getLogger(__name__)
+
+CONFIG_FILE = os.getenv("NOTIFY_CONFIG_FILE", "app/notification_config.json")
+
+# Defaults for factories without their own config
+DEFAULT_CONFIG = {
+    "window": float(os.getenv("NOTIFY_DIGEST_WINDOW", "10")),  # seconds, 0 = send every prediction
+    "quality_min": None,    # alert immediately when quality drops below this
+    "dilution_max": None,   # alert immediately when dilution rises above this
+}
+
+
+def format_prediction(factory_medicine_id: str, message: dict, title: str = "📢 *Prediction Update*") -> str:
+    return (
+        f"{title} for `{factory_medicine_id}`\n\n"
+        f"🍬 Sweet: {message['taste']['sweet']}\n"
+        f"🧂 Salty: {message['taste']['salty']}\n"
+        f"🍋 Sour: {message['taste']['sour']}\n"
+        f"☕ Bitter: {message['taste']['bitter']}\n"
+        f"🍄 Umami: {message['taste']['umami']}\n\n"
+        f"✨ Quality: {message['quality']}\n"
+        f"💧 Dilution: {message['dilution']}"
+    )
+
+
+def format_digest(factory_medicine_id: str, messages: list, window: float) -> str:
+    latest = messages[-1]
+    qualities = [m["quality"] for m in messages]
+    dilutions = [m["dilution"] for m in messages]
+    return (
+        f"📊 *Prediction Digest* for `{factory_medicine_id}`\n"
+        f"🔢 {len(messages)} predictions in {round(window)}s\n\n"
+        f"Latest:\n"
+        f"🍬 Sweet: {latest['taste']['sweet']}\n"
+        f"🧂 Salty: {latest['taste']['salty']}\n"
+        f"🍋 Sour: {latest['taste']['sour']}\n"
+        f"☕ Bitter: {latest['taste']['bitter']}\n"
+        f"🍄 Umami: {latest['taste']['umami']}\n\n"
+        f"✨ Quality: {latest['quality']} (min {min(qualities)}, max {max(qualities)})\n"
+        f"💧 Dilution: {latest['dilution']} (min {min(dilutions)}, max {max(dilutions)})"
+    )
+
+
+class DigestCoalescer:
+    """
+    Merges prediction notifications per factory.
+
+    The first prediction opens a `window`-second buffer; everything that
+    arrives before it closes is sent as one digest. Predictions crossing the
+    factory's alert thresholds skip the buffer and are sent at once.
+    """
+
+    def __init__(self, config_file: str = CONFIG_FILE):
+        self.config_file = config_file
+        self._config = self._load_config()
+        self._buffers = {}
+        self._lock = threading.Lock()
+
+    # ---------------- config ----------------
+    def _load_config(self) -> dict:
+        try:
+            with open(self.config_file) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def get_config(self, factory_medicine_id: str) -> dict:
+        with self._lock:
+            return {**DEFAULT_CONFIG, **self._config.get(factory_medicine_id, {})}
+
+    def set_config(self, factory_medicine_id: str, config: dict) -> dict:
+        unknown = set(config) - set(DEFAULT_CONFIG)
+        if unknown:
+            raise ValueError(f"Unknown config keys: {sorted(unknown)}")
+        with self._lock:
+            self._config.setdefault(factory_medicine_id, {}).update(config)
+            tmp = f"{self.config_file}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(self._config, f, indent=2)
+            os.replace(tmp, self.config_file)
+        return self.get_config(factory_medicine_id)
+
+    # ---------------- coalescing ----------------
+    @staticmethod
+    def is_alert(message: dict, config: dict) -> bool:
+        if config["quality_min"] is not None and message["quality"] < config["quality_min"]:
+            return True
+        if config["dilution_max"] is not None and message["dilution"] > config["dilution_max"]:
+            return True
+        return False
+
+    def add(self, factory_medicine_id: str, message: dict):
+        """Send now (alert / no window) or buffer into the factory's open digest."""
+        config = self.get_config(factory_medicine_id)
+        if self.is_alert(message, config):
+            self._send(factory_medicine_id, format_prediction(factory_medicine_id, message, "🚨 *Prediction Alert*"))
+            return
+        if not config["window"]:
+            self._send(factory_medicine_id, format_prediction(factory_medicine_id, message))
+            return
+
+        with self._lock:
+            buffer = self._buffers.get(factory_medicine_id)
+            if buffer is None:
+                buffer = self._buffers[factory_medicine_id] = {"messages": [], "opened_at": time.monotonic()}
+                timer = threading.Timer(config["window"], self.flush, args=(factory_medicine_id,))
+                timer.daemon = True
+                timer.start()
+            buffer["messages"].append(message)
+
+    def flush(self, factory_medicine_id: str):
+        with self._lock:
+            buffer = self._buffers.pop(factory_medicine_id, None)
+        if not buffer or not buffer["messages"]:
+            return
+        messages = buffer["messages"]
+        if len(messages) == 1:
+            text = format_prediction(factory_medicine_id, messages[0])
+        else:
+            text = format_digest(factory_medicine_id, messages, time.monotonic() - buffer["opened_at"])
+        self._send(factory_medicine_id, text)
+
+    def flush_all(self):
+        for factory_medicine_id in list(self._buffers):
+            self.flush(factory_medicine_id)
+
+    def _send(self, factory_medicine_id: str, text: str):
+        try:
+            outbox.notify_factory(factory_medicine_id, text, parse_mode="Markdown")
+        except Exception as e:
+            logger.warning("Telegram error: %s", e)
+
+
+digests = DigestCoalescer()
@@ -0,0 +1,259 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from app.utils.subscriptions import subscriptions
+from app.utils.telegram_dispatcher import dispatcher
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_DB = os.getenv("NOTIFY_OUTBOX_DB", "app/outbox.db")
+OUTBOX_WORKERS = int(os.getenv("NOTIFY_OUTBOX_WORKERS", "4"))
+MAX_ATTEMPTS = int(os.getenv("NOTIFY_OUTBOX_MAX_ATTEMPTS", "6"))
+BACKOFF_BASE = 5.0          # seconds, doubled per attempt
+BACKOFF_MAX = 600.0
+LEASE_SECONDS = 120.0       # a claimed message is re-delivered if not settled in time
+SENT_RETENTION = 24 * 3600  # keep sent keys this long to de-duplicate re-enqueues
+POLL_INTERVAL = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    factory_medicine_id TEXT,
+    chat_id TEXT NOT NULL,
+    text TEXT NOT NULL,
+    parse_mode TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    sent_at REAL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at);
+CREATE TABLE IF NOT EXISTS dead_letter (
+    id INTEGER PRIMARY KEY,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    factory_medicine_id TEXT,
+    chat_id TEXT NOT NULL,
+    text TEXT NOT NULL,
+    parse_mode TEXT,
+    attempts INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    failed_at REAL NOT NULL,
+    last_error TEXT
+);
+"""
+
+
+class NotificationOutbox:
+    """
+    Durable Telegram outbox shared by every notification path.
+
+    `notify_factory()` writes one row per subscribed chat into a local SQLite
+    outbox (a single WAL append on the request path) and returns. Worker
+    coroutines on the dispatcher's event loop claim due rows, deliver them,
+    and either mark them sent, reschedule them with exponential backoff, or
+    move them to `dead_letter` after MAX_ATTEMPTS / a permanent error.
+    Rows are keyed by an idempotency key so re-enqueueing the same message
+    for the same chat is a no-op.
+    """
+
+    def __init__(self, path: str = OUTBOX_DB):
+        self.path = path
+        self._db = None
+        self._lock = threading.Lock()
+        self._wakeup = None
+        self._stopping = False
+        self._workers = []
+
+    @property
+    def _conn(self):
+        # opened on first use so importing the module has no side effects
+        if self._db is None:
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(SCHEMA)
+            self._db = db
+        return self._db
+
+    # ---------------- enqueue (request path) ----------------
+    def enqueue(self, chat_ids, text: str, parse_mode: str = None,
+                factory_medicine_id: str = None, key: str = None) -> int:
+        """Persist `text` for each chat. Returns the number of new rows."""
+        key = key or uuid.uuid4().hex
+        now = time.time()
+        rows = [(f"{key}:{chat_id}", factory_medicine_id, str(chat_id), text, parse_mode, now, now)
+                for chat_id in chat_ids]
+        with self._lock:
+            cur = self._conn.executemany(
+                "INSERT OR IGNORE INTO outbox (idempotency_key, factory_medicine_id, chat_id, text, parse_mode, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            added = cur.rowcount
+        if added and self._wakeup is not None:
+            dispatcher.loop.call_soon_threadsafe(self._wakeup.set)
+        return added
+
+    def notify_factory(self, factory_medicine_id: str, text: str, parse_mode: str = None, key: str = None) -> list:
+        """Enqueue `text` for every chat subscribed to the factory. Returns the chat ids."""
+        chat_ids = subscriptions.chat_ids(factory_medicine_id)
+        if chat_ids:
+            self.enqueue(chat_ids, text, parse_mode, factory_medicine_id, key)
+        return chat_ids
+
+    # ---------------- claiming / settling ----------------
+    def _claim(self):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT * FROM outbox WHERE status IN ('pending', 'inflight') AND next_attempt_at <= ? "
+                    "ORDER BY next_attempt_at, id LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE outbox SET status = 'inflight', attempts = attempts + 1, next_attempt_at = ? WHERE id = ?",
+                        (now + LEASE_SECONDS, row["id"]),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return row
+
+    def _settle(self, row, result: dict):
+        now = time.time()
+        attempts = row["attempts"] + 1
+        status_code = result.get("status_code")
+        permanent = status_code is not None and 400 <= status_code < 500 and status_code != 429
+        with self._lock:
+            if result["ok"]:
+                self._conn.execute("UPDATE outbox SET status = 'sent', sent_at = ?, last_error = NULL WHERE id = ?", (now, row["id"]))
+            elif permanent or attempts >= MAX_ATTEMPTS:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO dead_letter (id, idempotency_key, factory_medicine_id, chat_id, text, parse_mode, attempts, created_at, failed_at, last_error) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (row["id"], row["idempotency_key"], row["factory_medicine_id"], row["chat_id"], row["text"],
+                         row["parse_mode"], attempts, row["created_at"], now, result.get("error")),
+                    )
+                    self._conn.execute("DELETE FROM outbox WHERE id = ?", (row["id"],))
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+                logger.error("Notification %s dead-lettered: %s", row["idempotency_key"], result.get("error"))
+            else:
+                delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+                self._conn.execute(
+                    "UPDATE outbox SET status = 'pending', next_attempt_at = ?, last_error = ? WHERE id = ?",
+                    (now + delay, result.get("error"), row["id"]),
+                )
+
+    def _purge_sent(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM outbox WHERE status = 'sent' AND sent_at < ?", (time.time() - SENT_RETENTION,))
+
+    # ---------------- workers ----------------
+    def start(self, workers: int = OUTBOX_WORKERS):
+        if self._workers:
+            return
+        self._stopping = False
+        dispatcher.run_coroutine(self._start_async(workers)).result()
+
+    async def _start_async(self, workers: int):
+        self._wakeup = asyncio.Event()
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(workers)]
+        self._workers.append(asyncio.create_task(self._janitor()))
+
+    async def _worker(self, n: int):
+        while not self._stopping:
+            try:
+                row = await asyncio.to_thread(self._claim)
+            except Exception as e:
+                logger.warning("Outbox worker %d error: %s", n, e)
+                row = None
+            if row is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                result = await dispatcher.send(row["chat_id"], row["text"], row["parse_mode"])
+                await asyncio.to_thread(self._settle, row, result)
+            except Exception:
+                # keep the worker alive; the row is claimed again once its lease expires
+                logger.exception("Outbox worker %d failed on %s", n, row["idempotency_key"])
+
+    async def _janitor(self):
+        while not self._stopping:
+            await asyncio.sleep(3600)
+            try:
+                await asyncio.to_thread(self._purge_sent)
+            except Exception:
+                logger.exception("Outbox purge failed")
+
+    def stop(self):
+        if not self._workers:
+            return
+        self._stopping = True
+
+        async def _cancel():
+            for task in self._workers:
+                task.cancel()
+            await asyncio.gather(*self._workers, return_exceptions=True)
+
+        dispatcher.run_coroutine(_cancel()).result(timeout=10)
+        self._workers = []
+
+    # ---------------- inspection ----------------
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+            dead = self._conn.execute("SELECT COUNT(*) FROM dead_letter").fetchone()[0]
+        return {
+            "pending": counts.get("pending", 0),
+            "inflight": counts.get("inflight", 0),
+            "sent": counts.get("sent", 0),
+            "dead_letter": dead,
+            "workers": max(0, len(self._workers) - 1),
+        }
+
+    def dead_letters(self, limit: int = 100) -> list:
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM dead_letter ORDER BY failed_at DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(r) for r in rows]
+
+    def requeue_dead_letters(self) -> int:
+        """Move every dead-lettered message back into the outbox."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            cur = self._conn.execute(
+                "INSERT OR REPLACE INTO outbox (idempotency_key, factory_medicine_id, chat_id, text, parse_mode, next_attempt_at, created_at) "
+                "SELECT idempotency_key, factory_medicine_id, chat_id, text, parse_mode, ?, created_at FROM dead_letter",
+                (now,),
+            )
+            self._conn.execute("DELETE FROM dead_letter")
+            self._conn.execute("COMMIT")
+            moved = cur.rowcount
+        if moved and self._wakeup is not None:
+            dispatcher.loop.call_soon_threadsafe(self._wakeup.set)
+        return moved
+
+
+outbox = NotificationOutbox()
@@ -0,0 +1,127 @@
+"""
+Micro-batching of concurrent single-row predictions (opt-in).
+
+With PREDICT_BATCHING=1, POST /predict requests for the same factory that
+arrive within PREDICT_BATCH_MAX_WAIT_MS of the first one (or until
+PREDICT_BATCH_MAX_SIZE rows are queued) are stacked into one matrix and sent
+to the inference pool as a single transform + predict call. Each waiting
+request gets its own row back, in the same shape inference_pool.predict
+returns for one row.
+
+Batching trades up to max-wait of added latency for fewer, larger model
+calls; it only pays off when requests for a factory actually overlap. The
+batch-size histogram (predict_batch_size) shows whether they do.
+"""
+import asyncio
+import logging
+import os
+import time
+
+from app.utils.inference_pool import inference_pool
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+PREDICT_BATCHING = os.getenv("PREDICT_BATCHING", "0") == "1"
+PREDICT_BATCH_MAX_WAIT_MS = float(os.getenv("PREDICT_BATCH_MAX_WAIT_MS", "5"))
+PREDICT_BATCH_MAX_SIZE = int(os.getenv("PREDICT_BATCH_MAX_SIZE", "32"))
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+metrics.set_buckets("predict_batch_size", BATCH_SIZE_BUCKETS)
+metrics.describe("predict_batch_size", "Rows per batched inference call")
+metrics.describe("predict_batches_total", "Batched inference calls by what triggered the flush")
+
+
+def _row_result(result: dict, i: int) -> dict:
+    """
+    Row `i` of a batch result, shaped like a one-row inference_pool.predict
+    result. Stage timings are per batch and recorded once by the batcher.
+    """
+    return {
+        "taste": [result["taste"][i]],
+        "quality": [result["quality"][i]],
+        "dilution": [result["dilution"][i]],
+        "timings": {},
+        "model_version": result["model_version"],
+    }
+
+
+class PredictBatcher:
+    def __init__(self, enabled: bool = PREDICT_BATCHING, max_wait_ms: float = PREDICT_BATCH_MAX_WAIT_MS,
+                 max_batch: int = PREDICT_BATCH_MAX_SIZE):
+        self.enabled = enabled
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch = max(1, max_batch)
+        self._pending = {}   # factory -> [(row, future, queued_at)]
+        self._timers = {}    # factory -> TimerHandle of the max-wait flush
+        self._running = set()
+        self.batches = 0
+        self.rows = 0
+
+    async def predict(self, factory_medicine_id: str, row: list) -> dict:
+        """Prediction for one input row; queued with concurrent rows for the same factory."""
+        if not self.enabled:
+            return await inference_pool.predict(factory_medicine_id, [row])
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(factory_medicine_id, [])
+        pending.append((row, future, time.perf_counter()))
+        if len(pending) >= self.max_batch:
+            self._flush(factory_medicine_id, "full")
+        elif len(pending) == 1:
+            self._timers[factory_medicine_id] = loop.call_later(
+                self.max_wait, self._flush, factory_medicine_id, "timeout")
+        return await future
+
+    def _flush(self, factory_medicine_id: str, trigger: str):
+        timer = self._timers.pop(factory_medicine_id, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(factory_medicine_id, None)
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._run(factory_medicine_id, batch))
+        # keep a reference until done; the event loop only holds weak ones
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+        metrics.inc("predict_batches_total", trigger=trigger)
+
+    async def _run(self, factory_medicine_id: str, batch: list):
+        started = time.perf_counter()
+        self.batches += 1
+        self.rows += len(batch)
+        metrics.observe("predict_batch_size", len(batch))
+        for _, _, queued_at in batch:
+            metrics.observe("span_duration_seconds", started - queued_at, span="predict.batch_wait")
+
+        try:
+            result = await inference_pool.predict(factory_medicine_id, [row for row, _, _ in batch])
+        except asyncio.CancelledError:
+            for _, future, _ in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for stage, seconds in result["timings"].items():
+            metrics.observe("span_duration_seconds", seconds, span=f"predict.{stage}")
+        for i, (_, future, _) in enumerate(batch):
+            if not future.done():   # the request may have been cancelled meanwhile
+                future.set_result(_row_result(result, i))
+        logger.debug("Predicted batch of %d rows for %s", len(batch), factory_medicine_id)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": int(self.enabled),
+            "batches": self.batches,
+            "rows": self.rows,
+            "pending": sum(len(p) for p in self._pending.values()),
+        }
+
+
+batcher = PredictBatcher()
@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+# Rows kept per factory (matches the GET /predict page size)
+CACHE_SIZE = 20
+# Seconds before a factory's window is re-read from Supabase. Other workers
+# (or manual inserts) only become visible after this, so keep it short when
+# running more than one process.
+CACHE_TTL = float(os.getenv("PREDICTIONS_CACHE_TTL", "30"))
+
+
+def authoritative() -> bool:
+    """
+    Whether this process sees every insert, so its window can answer delta
+    queries without the database. False under app.server / WEB_CONCURRENCY > 1
+    (other workers insert too); PREDICTIONS_CACHE_AUTHORITATIVE=0/1 overrides.
+    Read per call: app.server sets WORKER_INDEX only after the app is imported.
+    """
+    flag = os.getenv("PREDICTIONS_CACHE_AUTHORITATIVE")
+    if flag is not None:
+        return flag == "1"
+    return "WORKER_INDEX" not in os.environ and int(os.getenv("WEB_CONCURRENCY", "1")) <= 1
+
+
+def parse_timestamp(value) -> datetime:
+    """Parse a Supabase / ISO-8601 timestamp into an aware UTC datetime."""
+    if isinstance(value, datetime):
+        ts = value
+    else:
+        ts = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(timezone.utc)
+
+
+class RecentPredictions:
+    """
+    Per-factory window of the newest predicted_data rows (newest first).
+
+    The window is loaded from Supabase on first read and then kept current by
+    the predict route pushing every inserted row, so polling clients are
+    served from memory. Rows pushed while a load is running are kept and
+    merged into the loaded window, which may have been read before them.
+    """
+
+    def __init__(self, size: int = CACHE_SIZE, ttl: float = CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._loaded_at = {}
+        self._loading = {}   # factory -> rows pushed since its load started
+
+    def get(self, factory_medicine_id: str):
+        """Return a copy of the cached window, or None if missing/stale."""
+        with self._lock:
+            loaded_at = self._loaded_at.get(factory_medicine_id)
+            if loaded_at is None or time.monotonic() - loaded_at > self.ttl:
+                return None
+            return list(self._rows[factory_medicine_id])
+
+    def start_load(self, factory_medicine_id: str):
+        """Call before querying the database for a fill(); pushes from now on are kept for it."""
+        with self._lock:
+            self._loading.setdefault(factory_medicine_id, [])
+
+    def fill(self, factory_medicine_id: str, rows: list):
+        """Replace the window with rows fetched from the database (newest first)."""
+        with self._lock:
+            known = {r.get("id") for r in rows}
+            pushed = [r for r in self._loading.pop(factory_medicine_id, []) if r.get("id") not in known]
+            window = deque(rows[:self.size], maxlen=self.size)
+            window.extendleft(pushed)
+            self._rows[factory_medicine_id] = window
+            self._loaded_at[factory_medicine_id] = time.monotonic()
+
+    def push(self, factory_medicine_id: str, row: dict):
+        """Add a freshly inserted row. Ignored until the window is loaded or loading."""
+        with self._lock:
+            if factory_medicine_id in self._rows:
+                self._rows[factory_medicine_id].appendleft(row)
+            pushed = self._loading.get(factory_medicine_id)
+            if pushed is not None:
+                pushed.append(row)
+                if len(pushed) > self.size:   # a load that failed never collects them
+                    del pushed[0]
+
+    def invalidate(self, factory_medicine_id: str = None):
+        with self._lock:
+            if factory_medicine_id is None:
+                self._rows.clear()
+                self._loaded_at.clear()
+                self._loading.clear()
+            else:
+                self._rows.pop(factory_medicine_id, None)
+                self._loaded_at.pop(factory_medicine_id, None)
+                self._loading.pop(factory_medicine_id, None)
+
+
+recent_predictions = RecentPredictions()
@@ -0,0 +1,116 @@
+"""
+Prediction result cache for repeated measurements (opt-in).
+
+While a sample stays in the chamber the device sends nearly identical
+readings. With PREDICT_CACHE=1 each input vector is quantized to a per-sensor
+resolution and the prediction for it is kept in a per-factory LRU, so a
+repeat reading skips the scaler and SVR path entirely. Results differ from
+an uncached prediction only by what the inputs differ within one resolution
+step.
+
+Entries are tagged with the model_version they were computed with; the
+first lookup after a re-train drops the factory's cache.
+
+    PREDICT_CACHE_SIZE         entries per factory (default 4096)
+    PREDICT_CACHE_RESOLUTION   "0.05" for every sensor, or per sensor:
+                               "temperature=0.1,mq3_ppm=0.001,as7263_r=0.1"
+"""
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+PREDICT_CACHE = os.getenv("PREDICT_CACHE", "0") == "1"
+PREDICT_CACHE_SIZE = int(os.getenv("PREDICT_CACHE_SIZE", "4096"))
+
+# Order of the values in an input row (see predict_routes._input_row)
+INPUT_COLS = ["temperature", "mq3_ppm", "as7263_r", "as7263_s", "as7263_t", "as7263_u", "as7263_v", "as7263_w"]
+
+DEFAULT_RESOLUTION = {
+    "temperature": 0.1,
+    "mq3_ppm": 0.001,
+    **{f"as7263_{ch}": 0.1 for ch in "rstuvw"},
+}
+
+
+def parse_resolution(spec: str) -> list:
+    """Per-column resolution from PREDICT_CACHE_RESOLUTION (unknown names raise ValueError)."""
+    resolution = dict(DEFAULT_RESOLUTION)
+    spec = spec.strip()
+    if spec and "=" not in spec:
+        resolution = {col: float(spec) for col in INPUT_COLS}
+    elif spec:
+        for part in spec.split(","):
+            name, _, value = part.partition("=")
+            name = name.strip()
+            if name not in resolution:
+                raise ValueError(f"Unknown sensor in PREDICT_CACHE_RESOLUTION: {name}")
+            resolution[name] = float(value)
+    if any(r <= 0 for r in resolution.values()):
+        raise ValueError("PREDICT_CACHE_RESOLUTION values must be positive")
+    return [resolution[col] for col in INPUT_COLS]
+
+
+class ResultCache:
+    def __init__(self, enabled: bool = PREDICT_CACHE, size: int = PREDICT_CACHE_SIZE,
+                 resolution: str = os.getenv("PREDICT_CACHE_RESOLUTION", "")):
+        self.enabled = enabled
+        self.size = size
+        self.resolution = parse_resolution(resolution)
+        self._lock = threading.Lock()
+        self._caches = {}   # factory -> (model_version, OrderedDict key -> result)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def key(self, row: list) -> tuple:
+        return tuple(round(value / step) for value, step in zip(row, self.resolution))
+
+    def get(self, factory_medicine_id: str, version: str, row: list):
+        """Cached result for `row` under model `version`, or None."""
+        key = self.key(row)
+        with self._lock:
+            entry = self._caches.get(factory_medicine_id)
+            if entry is not None and entry[0] != version:
+                # re-trained: every cached result belongs to the old model
+                del self._caches[factory_medicine_id]
+                self.invalidations += 1
+                entry = None
+            result = entry[1].get(key) if entry is not None else None
+            if result is None:
+                self.misses += 1
+                return None
+            entry[1].move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, factory_medicine_id: str, version: str, row: list, result: dict):
+        key = self.key(row)
+        with self._lock:
+            entry = self._caches.get(factory_medicine_id)
+            if entry is None or entry[0] != version:
+                entry = self._caches[factory_medicine_id] = (version, OrderedDict())
+            entry[1][key] = result
+            entry[1].move_to_end(key)
+            if len(entry[1]) > self.size:
+                entry[1].popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._caches.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": int(self.enabled),
+            "entries": sum(len(c) for _, c in self._caches.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+result_cache = ResultCache()
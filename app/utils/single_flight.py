@@ -0,0 +1,109 @@
+"""
+Single-flight coalescing of identical read queries.
+
+Read handlers run in the threadpool; when several ask for the same query at
+once (dashboards and devices polling the same factory), the first caller
+runs it and the others wait for and share its result (or its exception).
+With SINGLE_FLIGHT_TTL > 0 a finished result is also reused for that many
+seconds, so a burst spread over a few hundred ms still costs one query.
+Writes call forget() so a reader never gets a result from before them.
+
+    rows = flight("getdata").do(factory_medicine_id, lambda: query().execute().data)
+
+Per group: `queries` actually executed, `collapsed` callers that joined an
+in-flight query, `ttl_hits` served from a finished one.
+"""
+import os
+import threading
+import time
+
+SINGLE_FLIGHT_TTL = float(os.getenv("SINGLE_FLIGHT_TTL", "0"))
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "finished_at")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.finished_at = None
+
+
+class SingleFlight:
+    def __init__(self, ttl: float = SINGLE_FLIGHT_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.queries = 0
+        self.collapsed = 0
+        self.ttl_hits = 0
+
+    def do(self, key, fn):
+        """fn() once for all concurrent callers with the same key."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None and call.finished_at is not None \
+                    and time.monotonic() - call.finished_at >= self.ttl:
+                call = None   # finished and expired
+            if call is None:
+                call = self._calls[key] = _Call()
+                leader = True
+                self.queries += 1
+            else:
+                leader = False
+                if call.finished_at is None:
+                    self.collapsed += 1
+                else:
+                    self.ttl_hits += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                call.finished_at = time.monotonic()
+                # errors are never reused; results only within the TTL
+                if (call.error is not None or self.ttl <= 0) and self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def forget(self, key=None):
+        """
+        After a write: later callers start a fresh query instead of joining one
+        that may have read before the write (all keys when key is None).
+        """
+        with self._lock:
+            if key is None:
+                self._calls.clear()
+            else:
+                self._calls.pop(key, None)
+
+    def stats(self) -> dict:
+        return {"queries": self.queries, "collapsed": self.collapsed, "ttl_hits": self.ttl_hits}
+
+
+_groups = {}
+_groups_lock = threading.Lock()
+
+
+def flight(name: str) -> SingleFlight:
+    """The named coalescing group (created on first use)."""
+    with _groups_lock:
+        group = _groups.get(name)
+        if group is None:
+            group = _groups[name] = SingleFlight()
+        return group
+
+
+def stats() -> dict:
+    return {name: group.stats() for name, group in list(_groups.items())}
@@ -0,0 +1,142 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from app.database import supabase
+
+logger = logging.getLogger(__name__)
+
+# Seconds between full reloads of telegram_factory_map
+SUBSCRIPTIONS_TTL = float(os.getenv("SUBSCRIPTIONS_TTL", "300"))
+PAGE_SIZE = 1000
+# SQLite file shared by every worker process: open Telegram registrations
+# (telegram_updates) and the subscription version below
+REGISTRATIONS_DB = os.getenv("TELEGRAM_REGISTRATIONS_DB", "app/telegram_registrations.db")
+# Seconds between checks of the shared version (how late other workers see a new chat)
+VERSION_CHECK_INTERVAL = 1.0
+
+VERSION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS subscription_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL
+);
+"""
+
+
+class SubscriptionIndex:
+    """
+    In-memory factory_medicine_id -> [chat_id] index over telegram_factory_map.
+
+    The whole table is loaded in one paged scan and reloaded after `ttl`
+    seconds or when invalidated. Chat ids are de-duplicated per factory.
+
+    invalidate() also bumps a version row in the shared SQLite file, and
+    every process reloads once it sees the version change, so a chat mapped
+    by the worker running the update consumer is notified from all workers.
+    """
+
+    def __init__(self, ttl: float = SUBSCRIPTIONS_TTL, shared_db: str = REGISTRATIONS_DB):
+        self.ttl = ttl
+        self.shared_db = shared_db
+        self._index = {}
+        self._loaded_at = None
+        self._version = None
+        self._checked_at = None
+        self._db = None
+        self._db_pid = None
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+
+    @property
+    def _conn(self):
+        # opened on first use, and again in a forked worker (connections must not cross a fork)
+        if self._db is None or self._db_pid != os.getpid():
+            db = sqlite3.connect(self.shared_db, check_same_thread=False, isolation_level=None, timeout=10)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(VERSION_SCHEMA)
+            self._db, self._db_pid = db, os.getpid()
+        return self._db
+
+    def _shared_version(self):
+        try:
+            with self._lock:
+                row = self._conn.execute("SELECT version FROM subscription_version WHERE id = 1").fetchone()
+            return row[0] if row else 0
+        except sqlite3.Error as e:
+            logger.warning("Cannot read the shared subscription version: %s", e)
+            return self._version
+
+    def load(self):
+        """Bulk-load every mapping from Supabase and swap in the new index."""
+        # read before the scan: an invalidation during it triggers another reload
+        version = self._shared_version()
+        index = {}
+        start = 0
+        while True:
+            res = supabase.table("telegram_factory_map") \
+                .select("factory_medicine_id, chat_id") \
+                .range(start, start + PAGE_SIZE - 1) \
+                .execute()
+            rows = res.data or []
+            for row in rows:
+                index.setdefault(row["factory_medicine_id"], {})[str(row["chat_id"])] = None
+            if len(rows) < PAGE_SIZE:
+                break
+            start += PAGE_SIZE
+
+        with self._lock:
+            self._index = {factory: list(chats) for factory, chats in index.items()}
+            self._loaded_at = self._checked_at = time.monotonic()
+            self._version = version
+        logger.info("Loaded Telegram subscriptions for %d factories", len(index))
+
+    def _is_stale(self) -> bool:
+        now = time.monotonic()
+        if self._loaded_at is None or now - self._loaded_at > self.ttl:
+            return True
+        if now - self._checked_at < VERSION_CHECK_INTERVAL:
+            return False
+        self._checked_at = now
+        if self._shared_version() != self._version:
+            self._loaded_at = None   # stays stale until the reload
+            return True
+        return False
+
+    def _ensure_fresh(self):
+        if self._is_stale():
+            with self._reload_lock:
+                # another thread may have reloaded while we waited
+                if self._is_stale():
+                    self.load()
+
+    def chat_ids(self, factory_medicine_id: str) -> list:
+        """Subscribed chat ids for a factory (empty list if none)."""
+        self._ensure_fresh()
+        with self._lock:
+            return list(self._index.get(factory_medicine_id, []))
+
+    def new_chat_ids(self, factory_medicine_id: str, chat_ids) -> list:
+        """Filter `chat_ids` down to unique ids not yet mapped to the factory."""
+        known = set(self.chat_ids(factory_medicine_id))
+        fresh = []
+        for chat_id in map(str, chat_ids):
+            if chat_id not in known:
+                known.add(chat_id)
+                fresh.append(chat_id)
+        return fresh
+
+    def invalidate(self):
+        """Reload on next use, here and (via the shared version) in every other worker."""
+        with self._lock:
+            self._loaded_at = None
+            try:
+                self._conn.execute(
+                    "INSERT INTO subscription_version (id, version) VALUES (1, 1) "
+                    "ON CONFLICT (id) DO UPDATE SET version = version + 1")
+            except sqlite3.Error as e:
+                logger.warning("Cannot bump the shared subscription version: %s", e)
+
+
+subscriptions = SubscriptionIndex()
@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import httpx
+
+from app.database import TELEGRAM_BOT_TOKEN, telegram_transport
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_API_BASE = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org")
+
+# Telegram allows ~30 messages/s per bot and ~1 message/s per chat. The bot-wide
+# rate is split evenly across the WEB_CONCURRENCY worker processes.
+GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))
+PER_CHAT_RATE = float(os.getenv("TELEGRAM_PER_CHAT_RATE", "1"))
+MAX_CONCURRENCY = int(os.getenv("TELEGRAM_MAX_CONCURRENCY", "20"))
+MAX_RETRIES = 3
+REQUEST_TIMEOUT = 10.0
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """Drain the bucket so nothing is sent for `seconds` (used for 429 retry_after)."""
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+        self.updated = time.monotonic()
+
+
+class TelegramDispatcher:
+    """
+    Sends Telegram messages from a dedicated event loop thread.
+
+    Uses one pooled keep-alive httpx.AsyncClient, sends to all chats
+    concurrently, rate limits globally and per chat, and retries 429s using
+    Telegram's `retry_after`. Safe to call from sync routes: `submit()`
+    returns a concurrent.futures.Future immediately.
+    """
+
+    def __init__(self, token: str = TELEGRAM_BOT_TOKEN, api_base: str = TELEGRAM_API_BASE):
+        self.api_url = f"{api_base}/bot{token}"
+        self._loop = None
+        self._thread = None
+        self._client = None
+        self._semaphore = None
+        self._global_bucket = None
+        self._chat_buckets = {}
+        self._start_lock = threading.Lock()
+
+        # metrics
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.rate_limited = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self._latencies = deque(maxlen=1000)
+
+    # ---------------- lifecycle ----------------
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name="telegram-dispatcher", daemon=True)
+            self._thread.start()
+            asyncio.run_coroutine_threadsafe(self._init_async(), self._loop).result()
+
+    async def _init_async(self):
+        self._client = httpx.AsyncClient(
+            transport=telegram_transport(),
+            timeout=REQUEST_TIMEOUT,
+            limits=httpx.Limits(max_connections=MAX_CONCURRENCY, max_keepalive_connections=MAX_CONCURRENCY),
+        )
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+        # read here, not at import: app/server.py sets WEB_CONCURRENCY before forking
+        self._global_bucket = TokenBucket(GLOBAL_RATE / max(1, int(os.getenv("WEB_CONCURRENCY", "1"))))
+
+    def close(self):
+        with self._start_lock:
+            if self._loop is None:
+                return
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result(timeout=5)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop = None
+
+    @property
+    def loop(self):
+        self._ensure_started()
+        return self._loop
+
+    def run_coroutine(self, coro):
+        """Schedule `coro` on the dispatcher loop; returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    # ---------------- sending ----------------
+    def submit(self, chat_ids, text: str, parse_mode: str = None):
+        """Queue `text` for every chat. Returns a Future resolving to per-chat results."""
+        return self.run_coroutine(self.send_many(chat_ids, text, parse_mode))
+
+    async def send_many(self, chat_ids, text: str, parse_mode: str = None):
+        return await asyncio.gather(*(self.send(chat_id, text, parse_mode) for chat_id in chat_ids))
+
+    async def send(self, chat_id, text: str, parse_mode: str = None) -> dict:
+        payload = {"chat_id": chat_id, "text": text}
+        if parse_mode:
+            payload["parse_mode"] = parse_mode
+
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(PER_CHAT_RATE, 1)
+
+        start = time.perf_counter()
+        error = None
+        status_code = None
+        async with self._semaphore:
+            for attempt in range(MAX_RETRIES + 1):
+                await bucket.acquire()
+                await self._global_bucket.acquire()
+                try:
+                    r = await self._client.post(f"{self.api_url}/sendMessage", json=payload)
+                except httpx.HTTPError as e:
+                    error = f"{type(e).__name__}: {e}"
+                    status_code = None
+                    if attempt < MAX_RETRIES:
+                        self.retried += 1
+                        await asyncio.sleep(2 ** attempt)
+                    continue
+
+                if r.status_code == 200:
+                    self._record_latency(time.perf_counter() - start)
+                    self.sent += 1
+                    return {"chat_id": chat_id, "ok": True, "attempts": attempt + 1}
+
+                error = r.text
+                status_code = r.status_code
+                if r.status_code == 429:
+                    self.rate_limited += 1
+                    try:
+                        retry_after = r.json().get("parameters", {}).get("retry_after", 1)
+                    except ValueError:
+                        retry_after = 1
+                    # the flood limit is bot-wide: hold back every chat, not just this one
+                    bucket.pause(retry_after)
+                    self._global_bucket.pause(retry_after)
+                    if attempt < MAX_RETRIES:
+                        self.retried += 1
+                    continue
+                if r.status_code >= 500 and attempt < MAX_RETRIES:
+                    self.retried += 1
+                    await asyncio.sleep(2 ** attempt)
+                    continue
+                break  # other 4xx: retrying will not help
+
+        self.failed += 1
+        logger.warning("Failed to send to %s: %s", chat_id, error)
+        return {"chat_id": chat_id, "ok": False, "status_code": status_code, "error": error}
+
+    # ---------------- metrics ----------------
+    def _record_latency(self, seconds: float):
+        self.latency_total += seconds
+        self.latency_max = max(self.latency_max, seconds)
+        self._latencies.append(seconds)
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+
+        def pct(p):
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 2) if latencies else None
+
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "rate_limited": self.rate_limited,
+            "latency_ms": {
+                "avg": round(self.latency_total / self.sent * 1000, 2) if self.sent else None,
+                "p50": pct(0.50),
+                "p95": pct(0.95),
+                "max": round(self.latency_max * 1000, 2) if self.sent else None,
+            },
+        }
+
+
+dispatcher = TelegramDispatcher()
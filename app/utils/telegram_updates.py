@@ -0,0 +1,260 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import httpx
+
+from app.database import supabase, TELEGRAM_BOT_TOKEN, telegram_transport
+from app.utils.subscriptions import subscriptions, REGISTRATIONS_DB
+from app.utils.telegram_dispatcher import TELEGRAM_API_BASE
+
+logger = logging.getLogger(__name__)
+
+OFFSET_FILE = os.getenv("TELEGRAM_OFFSET_FILE", "app/telegram_offset.json")
+LONG_POLL_TIMEOUT = 25      # seconds Telegram holds getUpdates open
+LEASE_TTL = LONG_POLL_TIMEOUT + 20   # seconds the consumer lease outlives its last renewal
+REGISTRATION_WINDOW = 30    # seconds a registration accepts chats
+RESULT_TTL = 300            # seconds a finished registration stays readable
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS registrations (
+    factory_medicine_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    chat_ids TEXT NOT NULL DEFAULT '[]',
+    inserted TEXT NOT NULL DEFAULT '[]',
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS consumer_lease (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    pid INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class TelegramUpdateConsumer:
+    """
+    The single getUpdates consumer of the app.
+
+    Runs in a background thread, long-polls getUpdates and persists the
+    offset to OFFSET_FILE so updates are neither re-read nor lost across
+    restarts. Messages whose text matches an open registration are mapped
+    to that factory in telegram_factory_map; a registration keeps accepting
+    chats until its window closes.
+
+    Registrations live in a small SQLite file (REGISTRATIONS_DB) rather than
+    in memory, so a registration opened or polled on any worker process is
+    seen by the one process that runs the consumer. A lease row in the same
+    file keeps that to one process even where workers are not numbered
+    (`uvicorn --workers N`); another takes over when the holder stops renewing.
+    """
+
+    def __init__(self, token: str = TELEGRAM_BOT_TOKEN, api_base: str = TELEGRAM_API_BASE,
+                 offset_file: str = OFFSET_FILE, registrations_db: str = REGISTRATIONS_DB):
+        self.api_url = f"{api_base}/bot{token}"
+        self.offset_file = offset_file
+        self.offset = self._load_offset()
+        self.registrations_db = registrations_db
+        self._db = None
+        self._db_pid = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def _conn(self):
+        # opened on first use, and again in a forked worker (connections must not cross a fork)
+        if self._db is None or self._db_pid != os.getpid():
+            db = sqlite3.connect(self.registrations_db, check_same_thread=False, isolation_level=None, timeout=10)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+            self._db, self._db_pid = db, os.getpid()
+        return self._db
+
+    # ---------------- offset persistence ----------------
+    def _load_offset(self):
+        try:
+            with open(self.offset_file) as f:
+                return json.load(f).get("offset")
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _save_offset(self):
+        tmp = f"{self.offset_file}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"offset": self.offset}, f)
+        os.replace(tmp, self.offset_file)
+
+    # ---------------- lifecycle ----------------
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="telegram-updates", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread = None
+        try:
+            with self._lock:
+                self._conn.execute("DELETE FROM consumer_lease WHERE pid = ?", (os.getpid(),))
+        except sqlite3.Error as e:
+            logger.warning("Cannot release the consumer lease: %s", e)
+
+    def _hold_lease(self) -> bool:
+        """Take or renew the consumer lease; False while another live process holds it."""
+        now = time.time()
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                lease = conn.execute("SELECT pid, expires_at FROM consumer_lease WHERE id = 1").fetchone()
+                held = lease is None or lease["pid"] == os.getpid() or now > lease["expires_at"]
+                if held:
+                    conn.execute("INSERT OR REPLACE INTO consumer_lease (id, pid, expires_at) VALUES (1, ?, ?)",
+                                 (os.getpid(), now + LEASE_TTL))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return held
+
+    def _run(self):
+        logger.info("Telegram update consumer started")
+        standby = False
+        with httpx.Client(transport=telegram_transport(), timeout=LONG_POLL_TIMEOUT + 10) as client:
+            while not self._stop.is_set():
+                try:
+                    if not self._hold_lease():
+                        if not standby:
+                            logger.info("Another process consumes Telegram updates; standing by")
+                            standby = True
+                        self._stop.wait(LONG_POLL_TIMEOUT)
+                        continue
+                    if standby:
+                        logger.info("Took over Telegram update consumption")
+                        standby = False
+                        self.offset = self._load_offset()   # the previous holder advanced it
+                    params = {"timeout": LONG_POLL_TIMEOUT, "allowed_updates": json.dumps(["message"])}
+                    if self.offset is not None:
+                        params["offset"] = self.offset
+                    r = client.get(f"{self.api_url}/getUpdates", params=params)
+                    if r.status_code == 409:
+                        # another process is polling the same bot
+                        logger.warning("getUpdates conflict: another consumer is running")
+                        self._stop.wait(LONG_POLL_TIMEOUT)
+                        continue
+                    updates = r.json().get("result", [])
+                    for update in updates:
+                        self._handle_update(update)
+                        self.offset = update["update_id"] + 1
+                    if updates:
+                        self._save_offset()
+                except Exception as e:
+                    logger.warning("Telegram update consumer error: %s", e)
+                    self._stop.wait(5)
+        logger.info("Telegram update consumer stopped")
+
+    # ---------------- registrations ----------------
+    def start_registration(self, factory_medicine: str) -> dict:
+        """Open (or extend) the registration window for a factory."""
+        now = time.time()
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                reg = conn.execute("SELECT * FROM registrations WHERE factory_medicine_id = ?",
+                                   (factory_medicine,)).fetchone()
+                if reg is None or now > reg["expires_at"]:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO registrations (factory_medicine_id, status, expires_at) "
+                        "VALUES (?, 'pending', ?)", (factory_medicine, now + REGISTRATION_WINDOW))
+                else:
+                    conn.execute("UPDATE registrations SET expires_at = ? WHERE factory_medicine_id = ?",
+                                 (now + REGISTRATION_WINDOW, factory_medicine))
+                reg = conn.execute("SELECT * FROM registrations WHERE factory_medicine_id = ?",
+                                   (factory_medicine,)).fetchone()
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return self._view(reg)
+
+    def get_registration(self, factory_medicine: str):
+        """Current state of a factory's registration, or None if there is none."""
+        now = time.time()
+        with self._lock:
+            conn = self._conn
+            reg = conn.execute("SELECT * FROM registrations WHERE factory_medicine_id = ?",
+                               (factory_medicine,)).fetchone()
+            if reg is None:
+                return None
+            if now > reg["expires_at"] + RESULT_TTL:
+                conn.execute("DELETE FROM registrations WHERE factory_medicine_id = ? AND expires_at = ?",
+                             (factory_medicine, reg["expires_at"]))
+                return None
+            if reg["status"] == "pending" and now > reg["expires_at"]:
+                conn.execute("UPDATE registrations SET status = 'timeout' "
+                             "WHERE factory_medicine_id = ? AND status = 'pending'", (factory_medicine,))
+                reg = conn.execute("SELECT * FROM registrations WHERE factory_medicine_id = ?",
+                                   (factory_medicine,)).fetchone()
+        return self._view(reg)
+
+    @staticmethod
+    def _view(reg) -> dict:
+        return {
+            "factory_medicine_id": reg["factory_medicine_id"],
+            "status": reg["status"],
+            "chat_ids": json.loads(reg["chat_ids"]),
+            "inserted": json.loads(reg["inserted"]),
+            "expires_in": max(0, round(reg["expires_at"] - time.time(), 1)),
+        }
+
+    def _handle_update(self, update: dict):
+        message = update.get("message")
+        if not message:
+            return
+        text = message.get("text", "").strip()
+        chat_id = str(message["chat"]["id"])
+
+        with self._lock:
+            reg = self._conn.execute("SELECT expires_at FROM registrations WHERE factory_medicine_id = ?",
+                                     (text,)).fetchone()
+        if reg is None or time.time() > reg["expires_at"]:
+            return
+
+        logger.info("Received registration %s from chat_id=%s", text, chat_id)
+        new_chat_ids = subscriptions.new_chat_ids(text, [chat_id])
+        rows = [{"factory_medicine_id": text, "chat_id": c} for c in new_chat_ids]
+        if rows:
+            supabase.table("telegram_factory_map").insert(rows).execute()
+            subscriptions.invalidate()
+            logger.info("Inserted %d rows into telegram_factory_map", len(rows))
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                reg = conn.execute("SELECT chat_ids, inserted FROM registrations WHERE factory_medicine_id = ?",
+                                   (text,)).fetchone()
+                if reg is not None:
+                    chat_ids = json.loads(reg["chat_ids"])
+                    if chat_id not in chat_ids:
+                        chat_ids.append(chat_id)
+                    inserted = json.loads(reg["inserted"]) + rows
+                    conn.execute(
+                        "UPDATE registrations SET status = 'success', chat_ids = ?, inserted = ? "
+                        "WHERE factory_medicine_id = ?", (json.dumps(chat_ids), json.dumps(inserted), text))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+
+consumer = TelegramUpdateConsumer()
@@ -1,14 +1,18 @@
-import pandas as pd
+import logging
 import pickle
-from sklearn.svm import SVR
-from sklearn.multioutput import MultiOutputRegressor
-from sklearn.preprocessing import StandardScaler
+from typing import TYPE_CHECKING
 from app.database import supabase
 import os
 
-# Local models directory
+# pandas / sklearn are imported inside the functions: they cost ~1s of
+# import time and only the /train route needs them
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Local models directory (created on first training run)
 MODELS_DIR = "app/models"
-os.makedirs(MODELS_DIR, exist_ok=True)
 
 # Columns
 INPUT_COLS = ["temperature", "mq3_ppm", "as7263_r", "as7263_s", "as7263_t", "as7263_u", "as7263_v", "as7263_w"]
@@ -17,22 +21,29 @@ QUALITY_COL = "quality"
 DILUTION_COL = "dilution"
 
 
-def fetch_data(factory_medicine_id: str) -> pd.DataFrame:
+def fetch_data(factory_medicine_id: str) -> "pd.DataFrame":
     """Fetch all rows for a given factory_medicine_id from Supabase."""
-    print(f"🔹 Fetching data for {factory_medicine_id} from Supabase...")
+    import pandas as pd
+
+    logger.info("Fetching data for %s", factory_medicine_id)
     res = supabase.table("sensor_data").select("*").eq("factory_medicine_id", factory_medicine_id).execute()
     data = res.data
     if not data:
-        print("⚠️ No data found!")
+        logger.warning("No data found for %s", factory_medicine_id)
         return pd.DataFrame()
     df = pd.DataFrame(data)
-    print(f"✅ Fetched {len(df)} rows.")
+    logger.info("Fetched %d rows", len(df))
     return df
 
 
-def train_models(df: pd.DataFrame, factory_medicine_id: str):
+def train_models(df: "pd.DataFrame", factory_medicine_id: str):
     """Train 3 SVM models and save locally."""
-    
+    from sklearn.svm import SVR
+    from sklearn.multioutput import MultiOutputRegressor
+    from sklearn.preprocessing import StandardScaler
+
+    os.makedirs(MODELS_DIR, exist_ok=True)
+
     X = df[INPUT_COLS]
     
     # Scale inputs
@@ -41,7 +52,7 @@ def train_models(df: pd.DataFrame, factory_medicine_id: str):
     scaler_path = os.path.join(MODELS_DIR, f"{factory_medicine_id}_scaler.pkl")
     with open(scaler_path, "wb") as f:
         pickle.dump(scaler, f)
-    print(f"✅ Scaler saved: {scaler_path}")
+    logger.info("Scaler saved: %s", scaler_path)
 
     # ---- Taste Model ----
     y_taste = df[TASTE_COLS]
@@ -50,7 +61,7 @@ def train_models(df: pd.DataFrame, factory_medicine_id: str):
     taste_path = os.path.join(MODELS_DIR, f"{factory_medicine_id}_taste.pkl")
     with open(taste_path, "wb") as f:
         pickle.dump(taste_model, f)
-    print(f"✅ Taste model trained and saved: {taste_path}")
+    logger.info("Taste model trained and saved: %s", taste_path)
 
     # ---- Quality Model ----
     y_quality = df[QUALITY_COL]
@@ -59,7 +70,7 @@ def train_models(df: pd.DataFrame, factory_medicine_id: str):
     quality_path = os.path.join(MODELS_DIR, f"{factory_medicine_id}_quality.pkl")
     with open(quality_path, "wb") as f:
         pickle.dump(quality_model, f)
-    print(f"✅ Quality model trained and saved: {quality_path}")
+    logger.info("Quality model trained and saved: %s", quality_path)
 
     # ---- Dilution Model ----
     y_dilution = df[DILUTION_COL]
@@ -68,7 +79,7 @@ def train_models(df: pd.DataFrame, factory_medicine_id: str):
     dilution_path = os.path.join(MODELS_DIR, f"{factory_medicine_id}_dilution.pkl")
     with open(dilution_path, "wb") as f:
         pickle.dump(dilution_model, f)
-    print(f"✅ Dilution model trained and saved: {dilution_path}")
+    logger.info("Dilution model trained and saved: %s", dilution_path)
 
     return [taste_path, quality_path, dilution_path, scaler_path]
 
@@ -76,7 +87,7 @@ def train_models(df: pd.DataFrame, factory_medicine_id: str):
 def upload_model(file_path: str):
     """Upload a local .pkl file to Supabase Storage bucket 'models'."""
     file_name = os.path.basename(file_path)
-    print(f"🔹 Uploading {file_name} to Supabase Storage...")
+    logger.info("Uploading %s to storage", file_name)
     
     try:
         with open(file_path, "rb") as f:
@@ -88,11 +99,11 @@ def upload_model(file_path: str):
                 path=file_name,
                 file=file_content
             )
-            print(f"✅ Uploaded {file_name}")
+            logger.info("Uploaded %s", file_name)
         except Exception as upload_err:
             # If file exists, try to remove and re-upload
             if "already exists" in str(upload_err).lower() or "duplicate" in str(upload_err).lower():
-                print(f"🔄 File exists, replacing {file_name}...")
+                logger.info("File exists, replacing %s", file_name)
                 try:
                     # Remove existing file
                     supabase.storage.from_("models").remove([file_name])
@@ -101,9 +112,9 @@ def upload_model(file_path: str):
                         path=file_name,
                         file=file_content
                     )
-                    print(f"✅ Replaced {file_name}")
+                    logger.info("Replaced %s", file_name)
                 except Exception as replace_err:
-                    print(f"❌ Replace failed: {str(replace_err)}")
+                    logger.error("Replace failed for %s: %s", file_name, replace_err)
                     raise replace_err
             else:
                 raise upload_err
@@ -116,5 +127,5 @@ def upload_model(file_path: str):
             return f"File uploaded as {file_name}"
         
     except Exception as e:
-        print(f"❌ Upload failed for {file_name}: {str(e)}")
+        logger.error("Upload failed for %s: %s", file_name, e)
         raise e
\ No newline at end of file
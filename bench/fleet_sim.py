@@ -0,0 +1,205 @@
+"""
+Simulated Picron fleet: runs many device agents as asyncio tasks against a
+running API and reports throughput, latency percentiles and error rates per
+endpoint.
+
+Each simulated device follows the real agent protocol from
+app/templates/picron_agent.py: poll GET /picron/{id}; on status 1 take a
+(synthetic) measurement and POST /data/, on status 2 POST /predict/{id};
+then reset the status the way reset_status() does. A simulated operator
+re-arms the status so devices keep cycling.
+
+    python bench/fleet_sim.py --base-url http://127.0.0.1:8000 --devices 50 --duration 60
+    python bench/fleet_sim.py --devices 500 --mode mixed --factory-prefix SIM --json fleet.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import httpx
+
+# Typical AS7263 calibrated values (R..W) and MQ3 voltage; readings jitter around these
+SPECTRAL_BASELINE = [410.0, 520.0, 610.0, 480.0, 350.0, 290.0]
+MQ3_BASELINE = 0.9
+
+
+class Stats:
+    """Latency samples and outcomes per endpoint label."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.errors = defaultdict(int)
+
+    def record(self, label, seconds, status=None, error=None):
+        self.latencies[label].append(seconds)
+        if error is not None:
+            self.errors[label] += 1
+        else:
+            self.statuses[label][status] += 1
+
+    def report(self, elapsed):
+        out = {}
+        for label in sorted(self.latencies):
+            lat = sorted(self.latencies[label])
+            n = len(lat)
+            failed = self.errors[label] + sum(c for s, c in self.statuses[label].items() if s >= 400)
+
+            def pct(p):
+                return round(lat[min(n - 1, int(p * n))] * 1000, 2)
+
+            out[label] = {
+                "requests": n,
+                "rps": round(n / elapsed, 2),
+                "p50_ms": pct(0.50),
+                "p90_ms": pct(0.90),
+                "p99_ms": pct(0.99),
+                "max_ms": round(lat[-1] * 1000, 2),
+                "error_rate": round(failed / n, 4),
+                "statuses": dict(self.statuses[label]),
+                "connection_errors": self.errors[label],
+            }
+        return out
+
+
+def synthetic_reading(rng):
+    return {
+        "temperature": 0,
+        "mq3_ppm": MQ3_BASELINE * rng.uniform(0.9, 1.1),
+        **{f"as7263_{ch}": base * rng.uniform(0.95, 1.05) for ch, base in zip("rstuvw", SPECTRAL_BASELINE)},
+    }
+
+
+async def timed(client, stats, label, method, url, **kwargs):
+    start = time.perf_counter()
+    try:
+        res = await client.request(method, url, **kwargs)
+    except httpx.HTTPError as e:
+        stats.record(label, time.perf_counter() - start, error=type(e).__name__)
+        return None
+    stats.record(label, time.perf_counter() - start, status=res.status_code)
+    return res
+
+
+async def device(n, args, client, stats, stop_at):
+    rng = random.Random(args.seed + n)
+    factory = f"{args.factory_prefix}-{n}" if args.factory_prefix else args.factory
+    # a device owns its picron row only with per-device factories
+    owns_row = bool(args.factory_prefix)
+
+    await asyncio.sleep(rng.uniform(0, args.ramp))
+    while time.monotonic() < stop_at:
+        res = await timed(client, stats, "GET /picron", "GET", f"/picron/{factory}")
+        row = None
+        if res is not None and res.status_code == 200:
+            data = res.json().get("data", [])
+            row = data[0] if data else None
+
+        status = row.get("status", 0) if row else 0
+        if status in (1, 2):
+            await asyncio.sleep(args.measure_time)  # sample settle + acquisition
+            reading = synthetic_reading(rng)
+            if status == 1:
+                payload = {
+                    "factory_medicine_id": factory,
+                    "timestamp": datetime.utcnow().isoformat() + "Z",
+                    **reading,
+                    "taste_sweet": rng.random(), "taste_salty": rng.random(), "taste_bitter": rng.random(),
+                    "taste_sour": rng.random(), "taste_umami": rng.random(),
+                    "quality": rng.random(), "dilution": rng.uniform(0.5, 2.0),
+                }
+                await timed(client, stats, "POST /data", "POST", "/data/", json=payload)
+            else:
+                await timed(client, stats, "POST /predict", "POST", f"/predict/{factory}", json=reading)
+
+            if owns_row:
+                # reset_status(): read the row back and write it with status 0, then the operator re-arms it
+                res = await timed(client, stats, "GET /picron", "GET", f"/picron/{factory}")
+                if res is not None and res.status_code == 200:
+                    reset = dict(res.json()["data"][0], status=0)
+                    await timed(client, stats, "POST /picron", "POST", f"/picron/{factory}", json=reset)
+                    await asyncio.sleep(args.operator_delay)
+                    await timed(client, stats, "POST /picron", "POST", f"/picron/{factory}", json=dict(reset, status=status))
+                continue
+
+        await asyncio.sleep(args.poll_interval)
+
+
+def picron_row(status):
+    return {
+        "taste_sweet": 0, "taste_salty": 0, "taste_bitter": 0, "taste_sour": 0, "taste_umami": 0,
+        "quality": 0, "dilution": 1.0, "status": status, "factory": "fleet-sim",
+    }
+
+
+async def arm(client, args):
+    """Set the starting status of every factory the fleet uses (the operator's job)."""
+    modes = {"dataset": [1], "predict": [2], "mixed": [1, 2]}[args.mode]
+    if args.factory_prefix:
+        factories = [f"{args.factory_prefix}-{n}" for n in range(args.devices)]
+    else:
+        factories = [args.factory]
+    for i, factory in enumerate(factories):
+        res = await client.post(f"/picron/{factory}", json=picron_row(modes[i % len(modes)]))
+        res.raise_for_status()
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        if not args.no_arm:
+            await arm(client, args)
+        stats = Stats()
+        start = time.monotonic()
+        stop_at = start + args.duration
+        await asyncio.gather(*(device(n, args, client, stats, stop_at) for n in range(args.devices)))
+        elapsed = time.monotonic() - start
+
+    return {
+        "config": {k: v for k, v in vars(args).items() if k != "json"},
+        "elapsed_s": round(elapsed, 2),
+        "endpoints": stats.report(elapsed),
+    }
+
+
+def print_report(result):
+    print(f"\n{result['config']['devices']} devices, {result['elapsed_s']}s, mode={result['config']['mode']}")
+    print(f"{'endpoint':<16}{'reqs':>8}{'rps':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}{'err %':>8}")
+    for label, s in result["endpoints"].items():
+        print(f"{label:<16}{s['requests']:>8}{s['rps']:>9}{s['p50_ms']:>10}{s['p90_ms']:>10}"
+              f"{s['p99_ms']:>10}{s['max_ms']:>10}{s['error_rate'] * 100:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated Picron fleet load generator")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--devices", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=60, help="seconds to run")
+    parser.add_argument("--mode", choices=["predict", "dataset", "mixed"], default="predict")
+    parser.add_argument("--factory", default="ABC_PainRelief", help="factory shared by all devices (needs trained models for predict)")
+    parser.add_argument("--factory-prefix", help="give each device its own factory '<prefix>-<n>' and run the full reset cycle")
+    parser.add_argument("--poll-interval", type=float, default=5.0, help="agent status polling interval")
+    parser.add_argument("--measure-time", type=float, default=0.5, help="simulated settle + acquisition time per measurement")
+    parser.add_argument("--operator-delay", type=float, default=1.0, help="delay before the operator re-arms a device")
+    parser.add_argument("--ramp", type=float, default=5.0, help="spread device start over this many seconds")
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--max-connections", type=int, default=1000)
+    parser.add_argument("--no-arm", action="store_true", help="do not set picron status before starting")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print_report(result)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nReport written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
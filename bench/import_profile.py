@@ -0,0 +1,141 @@
+"""
+Cold-start profile of the API process.
+
+Imports app.main in a fresh interpreter under `python -X importtime` and
+reports the slowest modules (cumulative and self time) and the total per
+top-level package. With --serve it also starts uvicorn and measures the time
+until /health answers.
+
+    python bench/import_profile.py
+    python bench/import_profile.py --serve --json startup.json
+    python bench/import_profile.py --max-import-ms 800   # exit 1 if slower
+
+Heavy packages that should stay off the startup path (numpy, pandas,
+sklearn, supabase) are listed under "deferred_violations" if they show up.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported on first use (predict / train / first query), never at startup
+DEFERRED = ("numpy", "pandas", "sklearn", "scipy", "supabase")
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def profile_imports(module: str, env: dict) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    modules = []
+    for line in proc.stderr.splitlines():
+        m = LINE.match(line)
+        if m:
+            self_us, cumulative_us, indent, name = m.groups()
+            modules.append({
+                "module": name,
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+                "depth": (len(indent) - 1) // 2,
+            })
+
+    total = next((m["cumulative_ms"] for m in modules if m["module"] == module), None)
+    by_package = defaultdict(float)
+    for m in modules:
+        by_package[m["module"].split(".")[0]] += m["self_ms"]
+    loaded = {m["module"].split(".")[0] for m in modules}
+
+    return {
+        "module": module,
+        "total_ms": total,
+        "modules": len(modules),
+        "slowest_cumulative": sorted(modules, key=lambda m: -m["cumulative_ms"])[:25],
+        "slowest_self": sorted(modules, key=lambda m: -m["self_ms"])[:15],
+        "by_package_ms": dict(sorted(((k, round(v, 1)) for k, v in by_package.items()), key=lambda kv: -kv[1])),
+        "deferred_violations": sorted(p for p in DEFERRED if p in loaded),
+    }
+
+
+def time_to_health(env: dict, port: int, timeout: float) -> float:
+    """Seconds from spawning uvicorn until GET /health returns 200."""
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/health", timeout=0.5).status_code == 200:
+                    return time.perf_counter() - start
+            except httpx.HTTPError:
+                pass
+            if proc.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {proc.returncode}")
+            time.sleep(0.02)
+        raise RuntimeError(f"/health did not answer within {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def print_report(result: dict):
+    print(f"import {result['module']}: {result['total_ms']:.1f} ms, {result['modules']} modules")
+    print(f"\n{'cumulative ms':>14}{'self ms':>10}  module")
+    for m in result["slowest_cumulative"]:
+        print(f"{m['cumulative_ms']:>14.1f}{m['self_ms']:>10.1f}  {'  ' * m['depth']}{m['module']}")
+    print("\nself time by package (ms)")
+    for pkg, ms in list(result["by_package_ms"].items())[:15]:
+        print(f"{ms:>10.1f}  {pkg}")
+    if result["deferred_violations"]:
+        print(f"\n⚠️ Imported at startup but meant to be deferred: {', '.join(result['deferred_violations'])}")
+    if "time_to_health_ms" in result:
+        print(f"\nuvicorn start -> /health 200: {result['time_to_health_ms']:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API cold-start / import-time profile")
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--serve", action="store_true", help="also measure uvicorn start until /health answers")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--max-import-ms", type=float, help="exit 1 if the import takes longer than this")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    # offline backends so the measurement does not depend on credentials or network
+    env = dict(os.environ)
+    env.setdefault("STORAGE_BACKEND", "local")
+    env.setdefault("TELEGRAM_BACKEND", "fake")
+    env.setdefault("TELEGRAM_UPDATES_CONSUMER", "0")
+
+    result = profile_imports(args.module, env)
+    if args.serve:
+        result["time_to_health_ms"] = round(time_to_health(env, args.port, args.timeout) * 1000, 1)
+
+    print_report(result)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nReport written to {args.json}")
+
+    if args.max_import_ms is not None and result["total_ms"] > args.max_import_ms:
+        print(f"\n❌ import took {result['total_ms']:.1f} ms (limit {args.max_import_ms} ms)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""
+Benchmark suite for the training, inference and data paths.
+
+Runs in-process against the local SQLite backend and the fake Telegram API
+(see app/utils/local_backend.py, app/utils/fake_telegram.py) with synthetic
+sensor datasets, so results do not depend on network or Supabase latency.
+
+Measures:
+  train     fit time per target (scaler, taste, quality, dilution) vs rows
+  inference load_models + predict latency, cold and warm, and POST /predict
+  batch     single-row vs batched inference throughput
+  ingest    POST /data and POST /data/bulk rows per second
+  getdata   GET /getdata latency vs history size
+
+    python bench/suite.py --json results.json
+    python bench/suite.py --quick --compare baseline.json --threshold 0.25
+
+With --compare the run is checked against a stored result file; metrics that
+got worse by more than --threshold are reported and the exit code is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime, timedelta
+
+# In-process backends unless explicitly overridden
+os.environ.setdefault("STORAGE_BACKEND", "local")
+os.environ.setdefault("TELEGRAM_BACKEND", "fake")
+os.environ.setdefault("TELEGRAM_UPDATES_CONSUMER", "0")
+os.environ.setdefault("NOTIFY_DIGEST_WINDOW", "0")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+from sklearn.multioutput import MultiOutputRegressor
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm import SVR
+
+from app.utils import trainer
+from app.routers import predict_routes
+from app.utils import model_cache as model_cache_module
+from app.utils.model_cache import model_cache, read_models
+from app.utils.trainer import INPUT_COLS, TASTE_COLS, QUALITY_COL, DILUTION_COL
+
+SPECTRAL_BASELINE = [410.0, 520.0, 610.0, 480.0, 350.0, 290.0]
+
+# the API scales plain arrays with a scaler fitted on a DataFrame
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+
+# ======================
+# Synthetic data
+# ======================
+def synthetic_dataset(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Sensor rows whose targets depend smoothly on the inputs, like real calibration data."""
+    rng = np.random.default_rng(seed)
+    spectral = np.array(SPECTRAL_BASELINE) * rng.uniform(0.8, 1.2, size=(rows, 6))
+    mq3 = rng.uniform(0.2, 2.0, size=rows)
+    temperature = rng.uniform(20, 35, size=rows)
+    z = (spectral / SPECTRAL_BASELINE - 1).sum(axis=1)
+
+    df = pd.DataFrame(spectral, columns=INPUT_COLS[2:])
+    df.insert(0, "mq3_ppm", mq3)
+    df.insert(0, "temperature", temperature)
+    for i, col in enumerate(TASTE_COLS):
+        df[col] = np.clip(0.5 + 0.3 * np.sin(z + i) + rng.normal(0, 0.02, rows), 0, 1)
+    df[QUALITY_COL] = np.clip(0.7 - 0.1 * mq3 + 0.2 * z + rng.normal(0, 0.02, rows), 0, 1)
+    df[DILUTION_COL] = 1.0 + 0.5 * z + rng.normal(0, 0.05, rows)
+    return df
+
+
+def sensor_rows(df: pd.DataFrame, factory: str, start: datetime = None) -> list:
+    start = start or datetime(2026, 1, 1)
+    records = df.to_dict(orient="records")
+    for i, r in enumerate(records):
+        r["factory_medicine_id"] = factory
+        r["timestamp"] = (start + timedelta(seconds=i)).isoformat()
+    return records
+
+
+# ======================
+# Measurement helpers
+# ======================
+def timeit(fn, repeat: int) -> list:
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t)
+    return samples
+
+
+def summary(samples: list) -> dict:
+    s = sorted(samples)
+    return {
+        "p50_ms": round(s[len(s) // 2] * 1000, 3),
+        "p95_ms": round(s[min(len(s) - 1, int(0.95 * len(s)))] * 1000, 3),
+        "mean_ms": round(sum(s) / len(s) * 1000, 3),
+    }
+
+
+class Results:
+    """Flat metric table: name -> {value, unit, better}."""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def add(self, name: str, value: float, unit: str, better: str = "lower"):
+        self.metrics[name] = {"value": round(value, 4), "unit": unit, "better": better}
+        print(f"  {name:<48}{value:>14.3f} {unit}")
+
+    def add_latency(self, name: str, samples: list):
+        for stat, value in summary(samples).items():
+            self.add(f"{name}.{stat}", value, "ms")
+
+
+def input_row(df: pd.DataFrame, i: int = 0) -> dict:
+    return {c: float(df[c].iloc[i]) for c in INPUT_COLS}
+
+
+# ======================
+# Benchmarks
+# ======================
+def bench_train(results: Results, sizes: list, seed: int):
+    print("train")
+    for rows in sizes:
+        df = synthetic_dataset(rows, seed)
+        X = df[INPUT_COLS]
+        t = time.perf_counter()
+        X_scaled = StandardScaler().fit_transform(X)
+        results.add(f"train.fit_scaler.rows_{rows}", (time.perf_counter() - t) * 1000, "ms")
+
+        targets = {
+            "taste": (MultiOutputRegressor(SVR()), df[TASTE_COLS]),
+            "quality": (SVR(), df[QUALITY_COL]),
+            "dilution": (SVR(), df[DILUTION_COL]),
+        }
+        for name, (model, y) in targets.items():
+            t = time.perf_counter()
+            model.fit(X_scaled, y)
+            results.add(f"train.fit_{name}.rows_{rows}", (time.perf_counter() - t) * 1000, "ms")
+
+        t = time.perf_counter()
+        trainer.train_models(df, f"BENCH_train_{rows}")
+        results.add(f"train.train_models.rows_{rows}", (time.perf_counter() - t) * 1000, "ms")
+
+
+def _predict_once(models: dict, X: np.ndarray):
+    X_scaled = models["scaler"].transform(X)
+    models["taste"].predict(X_scaled)
+    models["quality"].predict(X_scaled)
+    models["dilution"].predict(X_scaled)
+
+
+def bench_inference(results: Results, client: TestClient, factory: str, df: pd.DataFrame, repeat: int):
+    print("inference")
+    X = df[INPUT_COLS].to_numpy()[:1]
+
+    def cold():
+        # drop the in-process model cache so every call reads the pickles
+        model_cache.clear()
+        _predict_once(predict_routes.load_models(factory), X)
+
+    results.add_latency("inference.load_and_predict_cold", timeit(cold, repeat))
+    results.add_latency("inference.read_models", timeit(lambda: read_models(factory), repeat))
+    results.add_latency("inference.load_and_predict_cached", timeit(
+        lambda: _predict_once(predict_routes.load_models(factory), X), repeat * 10))
+
+    models = predict_routes.load_models(factory)
+    results.add_latency("inference.predict_warm", timeit(lambda: _predict_once(models, X), repeat * 10))
+
+    payload = input_row(df)
+    client.post(f"/predict/{factory}", json=payload)
+    results.add_latency("http.post_predict", timeit(lambda: client.post(f"/predict/{factory}", json=payload), repeat))
+
+
+def bench_batch(results: Results, factory: str, df: pd.DataFrame, batch: int, repeat: int):
+    print("batch")
+    models = predict_routes.load_models(factory)
+    X = df[INPUT_COLS].to_numpy()[:batch]
+
+    def single():
+        for i in range(len(X)):
+            _predict_once(models, X[i:i + 1])
+
+    # best of a few runs; throughput of a single pass is noisy
+    best = min(timeit(single, max(1, repeat // 5)))
+    results.add(f"batch.single_rows_per_s.n_{len(X)}", len(X) / best, "rows/s", "higher")
+    best = min(timeit(lambda: _predict_once(models, X), repeat))
+    results.add(f"batch.batched_rows_per_s.n_{len(X)}", len(X) / best, "rows/s", "higher")
+
+
+def bench_ingest(results: Results, client: TestClient, df: pd.DataFrame, rows: int):
+    print("ingest")
+    records = sensor_rows(df.head(rows), "BENCH_ingest")
+    t = time.perf_counter()
+    for r in records:
+        client.post("/data/", json=r)
+    results.add("ingest.post_data_rows_per_s", len(records) / (time.perf_counter() - t), "rows/s", "higher")
+
+    bulk = [dict(r, reading_id=f"bench-{i}") for i, r in enumerate(records)]
+    t = time.perf_counter()
+    for i in range(0, len(bulk), 100):
+        client.post("/data/bulk", json=bulk[i:i + 100])
+    results.add("ingest.post_data_bulk_rows_per_s", len(bulk) / (time.perf_counter() - t), "rows/s", "higher")
+
+
+def bench_getdata(results: Results, client: TestClient, sizes: list, repeat: int, seed: int):
+    print("getdata")
+    from app.database import supabase
+
+    for rows in sizes:
+        factory = f"BENCH_history_{rows}"
+        records = sensor_rows(synthetic_dataset(rows, seed), factory)
+        for i in range(0, len(records), 500):
+            supabase.table("sensor_data").insert(records[i:i + 500]).execute()
+        results.add_latency(f"http.getdata.rows_{rows}", timeit(lambda: client.get(f"/getdata/{factory}"), repeat))
+
+
+# ======================
+# Baseline comparison
+# ======================
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """Metrics that got worse than the baseline by more than `threshold` (relative)."""
+    regressions = []
+    for name, m in current["metrics"].items():
+        base = baseline["metrics"].get(name)
+        if not base or not base["value"]:
+            continue
+        change = (m["value"] - base["value"]) / base["value"]
+        worse = change > threshold if m["better"] == "lower" else change < -threshold
+        if worse:
+            regressions.append({"metric": name, "baseline": base["value"], "current": m["value"],
+                                "change_pct": round(change * 100, 1), "unit": m["unit"]})
+    return regressions
+
+
+def run(args) -> dict:
+    models_dir = tempfile.mkdtemp(prefix="bench_models_")
+    trainer.MODELS_DIR = model_cache_module.MODELS_DIR = models_dir
+    results = Results()
+    try:
+        from app.main import app
+
+        with TestClient(app) as client:
+            bench_train(results, args.train_rows, args.seed)
+
+            factory = f"BENCH_train_{args.train_rows[-1]}"
+            df = synthetic_dataset(max(args.batch, args.ingest_rows), args.seed + 1)
+            bench_inference(results, client, factory, df, args.repeat)
+            bench_batch(results, factory, df, args.batch, args.repeat)
+            bench_ingest(results, client, df, args.ingest_rows)
+            bench_getdata(results, client, args.history_rows, args.repeat, args.seed)
+    finally:
+        shutil.rmtree(models_dir, ignore_errors=True)
+
+    return {
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "storage_backend": os.environ["STORAGE_BACKEND"],
+        },
+        "config": {k: v for k, v in vars(args).items() if k not in ("json", "compare")},
+        "metrics": results.metrics,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PhotonTroppers benchmark suite")
+    parser.add_argument("--train-rows", type=int, nargs="+", default=[100, 500, 1000, 2000])
+    parser.add_argument("--history-rows", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--ingest-rows", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=256)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--quick", action="store_true", help="small sizes for a fast smoke run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="baseline results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown before flagging")
+    args = parser.parse_args()
+    if args.quick:
+        args.train_rows, args.history_rows = [100, 300], [100, 1000]
+        args.ingest_rows, args.batch, args.repeat = 100, 64, 5
+
+    result = run(args)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) vs {args.compare} (threshold {args.threshold:.0%}):")
+            for r in regressions:
+                print(f"  {r['metric']:<48}{r['baseline']:>12} -> {r['current']:<12} {r['unit']} ({r['change_pct']:+}%)")
+            sys.exit(1)
+        print(f"\n✅ No regressions vs {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+-- Client-generated reading ids make device retries and bulk re-uploads idempotent:
+-- POST /data/ and /data/bulk upsert on reading_id and skip readings already stored.
+-- Rows without a reading_id (older agents) stay allowed; NULLs never conflict.
+alter table sensor_data add column if not exists reading_id text;
+
+create unique index if not exists sensor_data_reading_id_key on sensor_data (reading_id);
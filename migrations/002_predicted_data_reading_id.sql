@@ -0,0 +1,6 @@
+-- Predictions keep the reading_id of the reading they were made for, so a
+-- retried POST /predict or a re-sent edge result is stored (and notified) once.
+-- Rows without a reading_id stay allowed; NULLs never conflict.
+alter table predicted_data add column if not exists reading_id text;
+
+create unique index if not exists predicted_data_reading_id_key on predicted_data (reading_id);
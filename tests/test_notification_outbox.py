@@ -0,0 +1,44 @@
+import time
+
+from app.utils import notification_outbox
+from app.utils.notification_outbox import NotificationOutbox
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_worker_survives_settle_error(tmp_path, monkeypatch):
+    sent = []
+
+    async def send(chat_id, text, parse_mode=None):
+        sent.append(text)
+        return {"ok": True}
+
+    monkeypatch.setattr(notification_outbox.dispatcher, "send", send)
+    outbox = NotificationOutbox(str(tmp_path / "outbox.db"))
+    settle = outbox._settle
+    failures = []
+
+    def flaky_settle(row, result):
+        if not failures:
+            failures.append(row["text"])
+            raise RuntimeError("database is locked")
+        settle(row, result)
+
+    monkeypatch.setattr(outbox, "_settle", flaky_settle)
+    outbox.start(workers=1)
+    try:
+        outbox.enqueue(["1"], "first")
+        assert wait_for(lambda: failures)
+        outbox.enqueue(["1"], "second")
+        # the single worker is still running and delivers the next row
+        assert wait_for(lambda: outbox.stats()["sent"] == 1)
+        assert sent == ["first", "second"]
+    finally:
+        outbox.stop()